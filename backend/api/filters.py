@@ -1,6 +1,10 @@
-from django.db.models import Count
+from django.db.models import Case, Value, When
+from django.db.models.functions import Lower
 from django_filters import rest_framework as filters
 from recipes.models import Ingredient, Recipe
+from recipes.ranking import RANKINGS
+from recipes.search import search_recipes
+from rest_framework.exceptions import ValidationError
 from users.models import User
 
 
@@ -14,21 +18,42 @@ class UserFilter(filters.FilterSet):
     def filter_is_subscribed(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(subscribing__user=user).annotate(
-                recipes_count=Count('recipes')
-            )
+            return queryset.filter(subscribing__user=user)
         return queryset
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
+    """Ingredient autocomplete filters.
+
+    Both filters match against LOWER(name) so that PostgreSQL can use the
+    functional text_pattern_ops index for prefixes and the trigram index
+    for substrings.
+    """
+
+    name = filters.CharFilter(method='filter_name')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'search')
+
+    def filter_name(self, queryset, name, value):
+        return queryset.annotate(name_lower=Lower('name')).filter(
+            name_lower__startswith=value.lower()
+        )
+
+    def filter_search(self, queryset, name, value):
+        value = value.lower()
+        return queryset.annotate(
+            name_lower=Lower('name')
+        ).filter(
+            name_lower__contains=value
+        ).annotate(
+            match_rank=Case(
+                When(name_lower__startswith=value, then=Value(0)),
+                default=Value(1)
+            )
+        ).order_by('match_rank', 'name_lower', 'id')
 
 
 class RecipeFilter(filters.FilterSet):
@@ -41,6 +66,12 @@ class RecipeFilter(filters.FilterSet):
     author = filters.NumberFilter(
         field_name='author__id'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
+    ordering = filters.CharFilter(
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -48,16 +79,40 @@ class RecipeFilter(filters.FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
+            'ordering',
+        )
+
+    def filter_search(self, queryset, name, value):
+        """Rank matches, see recipes.search."""
+        if 'cursor' in self.request.query_params:
+            raise ValidationError(
+                {'search': 'Search results do not support cursor pagination'}
+            )
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Order by the materialized score, see refresh_recipe_scores."""
+        if value not in RANKINGS:
+            raise ValidationError(
+                {'ordering': f'Choose one of: {", ".join(RANKINGS)}'}
+            )
+        if 'cursor' in self.request.query_params:
+            raise ValidationError(
+                {'ordering': 'Ranked lists do not support cursor pagination'}
+            )
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', '-id'
         )
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorited_by__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(in_shopping_carts__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset 
\ No newline at end of file
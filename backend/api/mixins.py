@@ -1,57 +1,47 @@
-from django.shortcuts import get_object_or_404
-from rest_framework import status
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from users.models import Subscription, User
-
-from .serializers.user import (SubscriptionCreateSerializer,
-                               SubscriptionSerializer)
+from django.db.models import Prefetch
+from recipes.models import Recipe
+from rest_framework.exceptions import ValidationError
 
 
 class SubscriptionMixin:
-    @action(
-        detail=True,
-        methods=['post', 'delete']
-    )
-    def subscribe(self, request, id=None):
-        user = request.user
+    """recipes_limit handling and recipe previews for subscription views."""
+
+    recipes_limit_default = 10
+    recipes_limit_max = 100
 
-        if request.method == 'POST':
-            author = get_object_or_404(User, id=id)
-            serializer = SubscriptionCreateSerializer(
-                data={'author': author.id},
-                context={'request': request}
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if limit is None:
+            return self.recipes_limit_default
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'A valid integer is required'}
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            serializer = SubscriptionSerializer(
-                author,
-                context={'request': request}
+        if limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Ensure this value is greater than or '
+                                  'equal to 0'}
             )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return min(limit, self.recipes_limit_max)
 
-        deleted_count = Subscription.objects.filter(
-            user=user,
-            author_id=id
-        ).delete()[0]
-        if not deleted_count:
-            return Response(
-                {'errors': 'You are not subscribed to this user'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    def with_recipes_preview(self, queryset, limit):
+        """Attach the latest `limit` recipes of every author.
 
-    @action(
-        detail=False,
-        methods=['get']
-    )
-    def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(subscribing__user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionSerializer(
-            pages,
-            many=True,
-            context={'request': request}
+        The sliced Prefetch is executed as a single ROW_NUMBER() window
+        query partitioned by author, whatever the number of authors.
+        """
+        return queryset.prefetch_related(
+            Prefetch(
+                'recipes',
+                queryset=Recipe.objects.only(
+                    'id', 'author_id', 'name', 'image', 'image_renditions',
+                    'cooking_time', 'pub_date'
+                )[:limit],
+                to_attr='recipes_preview'
+            )
         )
-        return self.get_paginated_response(serializer.data)
\ No newline at end of file
+
+    def get_subscription_context(self, limit):
+        return {'request': self.request, 'recipes_limit': limit}
@@ -1,6 +1,6 @@
 from .recipe import (IngredientInRecipeSerializer, IngredientSerializer,
-                     RecipeCreateUpdateSerializer, RecipeListSerializer,
-                     RecipeMinifiedSerializer)
+                     PantryRecipeSerializer, RecipeCreateUpdateSerializer,
+                     RecipeListSerializer, RecipeMinifiedSerializer)
 from .user import (CustomUserCreateSerializer, CustomUserSerializer,
                    SetAvatarSerializer, SubscriptionCreateSerializer,
                    SubscriptionSerializer)
@@ -1,10 +1,19 @@
-from common.fields import Base64ImageField
+from common.fields import (Base64ImageField, ImageRenditionsField,
+                           absolute_renditions)
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import (aprefetch_related_objects,
+                              prefetch_related_objects)
+from recipes.cache import (RECIPE_FRAGMENT_TIMEOUT, bump_recipe_carts,
+                           recipe_fragment_key)
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart)
 from rest_framework import serializers
 
 from .user import CustomUserSerializer
 
+MAX_AMOUNT = 32767
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,8 +37,20 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
-    author = CustomUserSerializer(read_only=True)
+class AuthorFragmentSerializer(CustomUserSerializer):
+    def get_is_subscribed(self, obj):
+        return False
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Viewer-independent part of a recipe, cached by RecipeListSerializer.
+
+    Viewer fields are rendered as False placeholders to keep the field
+    order, and image URLs stay relative to the host.
+    """
+
+    author = AuthorFragmentSerializer(read_only=True)
+    image_renditions = ImageRenditionsField('image')
     ingredients = IngredientInRecipeSerializer(
         source='recipe_ingredients',
         many=True,
@@ -45,6 +66,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'author',
             'name',
             'image',
+            'image_renditions',
             'text',
             'ingredients',
             'cooking_time',
@@ -53,24 +75,124 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
+        return False
+
+    def get_is_in_shopping_cart(self, obj):
+        return False
+
+
+def render_fragments(recipes):
+    """Render fragments of recipes with author and ingredients loaded."""
+    return {
+        recipe_fragment_key(recipe):
+            RecipeFragmentSerializer(recipe).to_representation(recipe)
+        for recipe in recipes
+    }
+
+
+async def aload_fragments(recipes):
+    """Async counterpart of RecipeListSerializer.load_fragments."""
+    keys = {recipe_fragment_key(recipe): recipe for recipe in recipes}
+    fragments = await cache.aget_many(list(keys))
+    missing = [recipe for key, recipe in keys.items() if key not in fragments]
+    if missing:
+        await aprefetch_related_objects(
+            missing, 'author', 'recipe_ingredients__ingredient'
+        )
+        rendered = render_fragments(missing)
+        await cache.aset_many(rendered, RECIPE_FRAGMENT_TIMEOUT)
+        fragments.update(rendered)
+    return fragments
+
+
+def with_viewer(fragment, request, is_subscribed, is_favorited,
+                is_in_shopping_cart):
+    """Merge the viewer's flags into a copy of a cached fragment."""
+    data = dict(fragment)
+    author = data['author'] = dict(data['author'])
+    author['is_subscribed'] = is_subscribed
+    data['is_favorited'] = is_favorited
+    data['is_in_shopping_cart'] = is_in_shopping_cart
+    if request is not None:
+        for item, field in ((data, 'image'), (author, 'avatar')):
+            if item[field]:
+                item[field] = request.build_absolute_uri(item[field])
+            renditions = item[f'{field}_renditions']
+            if renditions:
+                item[f'{field}_renditions'] = absolute_renditions(
+                    renditions, request
+                )
+    return data
+
+
+class RecipePageSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        self.child.load_fragments(recipes)
+        return super().to_representation(recipes)
+
+
+class RecipeListSerializer(RecipeFragmentSerializer):
+    author = CustomUserSerializer(read_only=True)
+
+    class Meta(RecipeFragmentSerializer.Meta):
+        list_serializer_class = RecipePageSerializer
+
+    def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        favorite = Favorite.objects.filter(
-            user=user,
-            recipe=obj
-        ).first()
-        return bool(favorite)
+        return Favorite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        cart_item = ShoppingCart.objects.filter(
-            user=user,
-            recipe=obj
-        ).first()
-        return bool(cart_item)
+        return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
+
+    def load_fragments(self, recipes):
+        """Fetch the fragments of the recipes with a single get_many.
+
+        Misses are rendered, prefetching ingredients for them only, and
+        written back with set_many. Fragments are kept in the context,
+        which nested and list serializers share.
+        """
+        fragments = self.context.setdefault('recipe_fragments', {})
+        keys = {
+            recipe_fragment_key(recipe): recipe for recipe in recipes
+        }
+        wanted = [key for key in keys if key not in fragments]
+        if not wanted:
+            return fragments
+        fragments.update(cache.get_many(wanted))
+        missing = [keys[key] for key in wanted if key not in fragments]
+        if missing:
+            prefetch_related_objects(
+                missing, 'author', 'recipe_ingredients__ingredient'
+            )
+            rendered = render_fragments(missing)
+            cache.set_many(rendered, RECIPE_FRAGMENT_TIMEOUT)
+            fragments.update(rendered)
+        return fragments
+
+    def to_representation(self, instance):
+        key = recipe_fragment_key(instance)
+        fragment = self.context.get('recipe_fragments', {}).get(key)
+        if fragment is None:
+            fragment = self.load_fragments([instance])[key]
+        return with_viewer(
+            fragment,
+            self.context.get('request'),
+            self.fields['author'].get_is_subscribed(instance.author),
+            self.get_is_favorited(instance),
+            self.get_is_in_shopping_cart(instance)
+        )
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -101,55 +223,131 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'At least one ingredient is required'
             )
-        ingredient_list = []
-        for item in value:
-            ingredient_id = item.get('id')
-            if not ingredient_id:
-                raise serializers.ValidationError(
-                    'Ingredient ID is required'
-                )
-            
-            ingredient = Ingredient.objects.filter(id=ingredient_id).first()
-            if not ingredient:
-                raise serializers.ValidationError(
+        ingredient_ids = [
+            self.to_positive_int(item.get('id')) for item in value
+        ]
+        ingredients = Ingredient.objects.in_bulk(
+            {pk for pk in ingredient_ids if pk is not None}
+        )
+        validated = []
+        errors = []
+        seen_ids = set()
+        for item, ingredient_id in zip(value, ingredient_ids):
+            item_errors = {}
+            if ingredient_id is None:
+                item_errors['id'] = ['Ingredient ID is required']
+            elif ingredient_id not in ingredients:
+                item_errors['id'] = [
                     f'Ingredient with id {ingredient_id} does not exist'
-                )
-            
-            if ingredient in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ingredients must be unique'
-                )
-            ingredient_list.append(ingredient)
-            amount = item.get('amount')
-            if not amount or int(amount) < 1:
-                raise serializers.ValidationError(
-                    'Amount must be greater than 0'
-                )
-        return value
+                ]
+            elif ingredient_id in seen_ids:
+                item_errors['id'] = ['Ingredients must be unique']
+            seen_ids.add(ingredient_id)
+            amount = self.to_positive_int(item.get('amount'))
+            if amount is None:
+                item_errors['amount'] = ['Amount must be greater than 0']
+            elif amount > MAX_AMOUNT:
+                item_errors['amount'] = [
+                    f'Amount must not exceed {MAX_AMOUNT}'
+                ]
+            errors.append(item_errors)
+            if not item_errors:
+                validated.append({
+                    'ingredient': ingredients[ingredient_id],
+                    'amount': amount
+                })
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+    @staticmethod
+    def to_positive_int(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
 
     def create_ingredients(self, recipe, ingredients):
         IngredientInRecipe.objects.bulk_create([
             IngredientInRecipe(
                 recipe=recipe,
-                ingredient_id=item['id'],
-                amount=int(item['amount'])
+                ingredient=item['ingredient'],
+                amount=item['amount']
             )
             for item in ingredients
         ])
 
+    def update_ingredients(self, recipe, ingredients):
+        """Apply only the difference between stored and submitted rows.
+
+        Returns True when any ingredient row was written.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        submitted = {item['ingredient'].id: item for item in ingredients}
+        removed_ids = existing.keys() - submitted.keys()
+        if removed_ids:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed_ids
+            ).delete()
+        added = [
+            item for ingredient_id, item in submitted.items()
+            if ingredient_id not in existing
+        ]
+        if added:
+            self.create_ingredients(recipe, added)
+        changed = []
+        for ingredient_id, item in submitted.items():
+            current = existing.get(ingredient_id)
+            if current is not None and current.amount != item['amount']:
+                current.amount = item['amount']
+                changed.append(current)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        return bool(removed_ids or added or changed)
+
+    def validate(self, attrs):
+        if 'ingredients' not in attrs:
+            raise serializers.ValidationError(
+                {'ingredients': 'This field is required.'}
+            )
+        return attrs
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
-        instance.recipe_ingredients.delete()
-        self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        ingredients_changed = self.update_ingredients(instance, ingredients)
+        if ingredients_changed:
+            transaction.on_commit(lambda: bump_recipe_carts([instance.id]))
+        changed_fields = [
+            attr for attr, value in validated_data.items()
+            if getattr(instance, attr) != value
+        ]
+        for attr in changed_fields:
+            setattr(instance, attr, validated_data[attr])
+        if changed_fields or ingredients_changed:
+            # Saving bumps updated_at and schedules the search and pantry
+            # updates in the post_save handler.
+            instance.save(update_fields=changed_fields + ['updated_at'])
+        return instance
 
     def to_representation(self, instance):
+        instance = (
+            Recipe.objects.select_related('author')
+            .with_user_annotations(self.context['request'].user)
+            .get(pk=instance.pk)
+        )
         return RecipeListSerializer(
             instance,
             context=self.context
@@ -194,12 +392,32 @@ class ShoppingCartCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class PantryRecipeSerializer(RecipeListSerializer):
+    missing_count = serializers.IntegerField(read_only=True)
+    matched_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + (
+            'missing_count',
+            'matched_count'
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['missing_count'] = instance.missing_count
+        data['matched_count'] = instance.matched_count
+        return data
+
+
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField('image')
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time'
         ) 
\ No newline at end of file
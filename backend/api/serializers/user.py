@@ -1,4 +1,4 @@
-from common.fields import Base64ImageField
+from common.fields import Base64ImageField, ImageRenditionsField
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import Recipe
@@ -22,13 +22,16 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField('image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar_renditions = ImageRenditionsField('avatar')
 
     class Meta:
         model = User
@@ -39,18 +42,32 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_renditions'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        subscription = Subscription.objects.filter(
-            user=user,
-            author=obj
-        ).first()
-        return bool(subscription)
+        return obj.id in self.get_subscribed_author_ids(user)
+
+    def get_subscribed_author_ids(self, user):
+        """Load the viewer's followed author IDs once per serializer tree.
+
+        Nested serializers share the root serializer context, so every
+        CustomUserSerializer rendered for a response reuses the same set.
+        """
+        author_ids = self.context.get('subscribed_author_ids')
+        if author_ids is None:
+            author_ids = set(
+                Subscription.objects.filter(user=user)
+                .values_list('author_id', flat=True)
+            )
+            self.context['subscribed_author_ids'] = author_ids
+        return author_ids
 
 
 class SubscriptionSerializer(CustomUserSerializer):
@@ -64,11 +81,10 @@ class SubscriptionSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        recipes = obj.recipes
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'recipes_preview', None)
+        if recipes is None:
+            limit = self.context.get('recipes_limit')
+            recipes = obj.recipes.all()[:limit]
         serializer = RecipeMinifiedSerializer(recipes, many=True)
         return serializer.data
 
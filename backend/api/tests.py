@@ -0,0 +1,794 @@
+import base64
+import csv
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from common.authentication import local_tokens
+from common.benchmark import InProcessDriver, generate_dataset, run_benchmark
+from common.checks import check_async_connections
+from common.management.commands.benchmark_api import SCENARIOS
+from common.pagination import RecipePagination
+from common.testing import QueryBudgetMixin
+from django.core.cache import cache
+from django.db import DatabaseError, connection, connections
+from django.test import (AsyncClient, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from PIL import Image
+from recipes import feed, pantry
+from recipes.models import FeedEntry, Ingredient, IngredientInRecipe, Recipe
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import Subscription, User
+
+from . import urls as api_urls
+
+
+def image_data_uri(color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), color).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+class AsyncReadURLConf:
+    """The project's API routes as with ASYNC_READ_VIEWS=True."""
+
+    urlpatterns = [
+        path('api/', include(
+            (api_urls.async_read_patterns() + api_urls.urlpatterns, 'api')
+        )),
+    ]
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, TransactionTestCase):
+    """Runs every budgeted action as a token client with cold caches.
+
+    TransactionTestCase, so that on-commit work (search vectors, and
+    with no worker threads the feed fan-out and renditions) runs inside
+    the measured request, which bounds the production cost from above.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_settings = override_settings(
+            MEDIA_ROOT=cls._media_root, IMAGE_RENDITION_WORKERS=0,
+            FEED_FANOUT_WORKERS=0
+        )
+        cls._media_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_settings.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.clear_caches()
+        self.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(5)
+        )
+        self.author = self.create_user('author')
+        self.user = self.create_user('user')
+        self.author_client = self.token_client(self.author)
+        self.client = self.token_client(self.user)
+        self.anonymous = APIClient()
+        self.recipe = self.create_recipe(self.author_client)
+        self.clear_caches()
+
+    @staticmethod
+    def clear_caches():
+        cache.clear()
+        local_tokens.clear()
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name=username, last_name=username, password='Pass12345!'
+        )
+
+    @staticmethod
+    def token_client(user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+        return client
+
+    def recipe_data(self, name='recipe'):
+        return {
+            'name': name,
+            'text': 'text',
+            'cooking_time': 10,
+            'image': image_data_uri(),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 10}
+                for ingredient in self.ingredients[:3]
+            ],
+        }
+
+    def create_recipe(self, client, name='recipe'):
+        response = client.post(
+            reverse('api:recipe-list'), self.recipe_data(name),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Recipe.objects.get(pk=response.data['id'])
+
+
+class RecipeQueryBudgetTests(QueryBudgetTestCase):
+    def url(self, name, *args):
+        return reverse(f'api:recipe-{name}', args=args)
+
+    def test_list(self):
+        self.client.post(self.url('favorite', self.recipe.pk))
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        queries = (
+            {'limit': 10},
+            {'is_favorited': 1, 'is_in_shopping_cart': 1},
+            {'author': self.author.pk, 'search': 'recipe'},
+            {'ordering': 'popular'},
+            {'cursor': '', 'count': 'exact'},
+        )
+        for client in (self.anonymous, self.client):
+            for query in queries:
+                self.clear_caches()
+                response = client.get(self.url('list'), query)
+                self.assertEqual(response.status_code, 200)
+                self.assertQueryBudget(response)
+                self.assertEqual(len(response.data['results']), 1)
+                recipe = response.data['results'][0]
+                self.assertEqual(recipe['id'], self.recipe.pk)
+                viewer = client is self.client
+                self.assertIs(recipe['is_favorited'], viewer)
+                self.assertIs(recipe['is_in_shopping_cart'], viewer)
+                self.assertIs(recipe['author']['is_subscribed'], False)
+
+    def test_list_pagination(self):
+        newer = self.create_recipe(self.author_client, 'newer')
+        self.clear_caches()
+        response = self.client.get(self.url('list'), {'limit': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [newer.pk]
+        )
+        self.assertIsNone(response.data['previous'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.pk]
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        response = self.client.get(
+            self.url('list'), {'limit': 1, 'cursor': ''}
+        )
+        self.assertEqual(response.data['results'][0]['id'], newer.pk)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['id'], self.recipe.pk)
+        self.assertIsNone(response.data['next'])
+
+    def test_list_etag(self):
+        url = self.url('list')
+        for query in ({}, {'cursor': ''}):
+            self.clear_caches()
+            etag = self.client.get(url, query)['ETag']
+            response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            response = self.author_client.patch(
+                self.url('detail', self.recipe.pk),
+                self.recipe_data(f'renamed {len(query)}'), format='json'
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_cursor_list_skips_count(self):
+        for query, counted in (
+            ({'cursor': ''}, False),
+            ({'cursor': '', 'count': 'exact'}, True),
+            ({}, True),
+        ):
+            self.clear_caches()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url('list'), query)
+            self.assertEqual(
+                any('COUNT(' in executed['sql'] for executed in queries),
+                counted,
+                query
+            )
+
+    def test_ranked_lists_reject_cursor(self):
+        for query in ({'search': 'recipe'}, {'ordering': 'popular'}):
+            response = self.client.get(
+                self.url('list'), {'cursor': '', **query}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(query)), response.data)
+
+    def test_known_count_only_replaces_exact_counts(self):
+        queryset = Recipe.objects.filter(cooking_time__gt=0)
+        for query, total in (
+            ({}, None),
+            ({'count': 'none'}, None),
+            ({'count': 'exact'}, 12345),
+        ):
+            request = Request(
+                APIRequestFactory().get('/', {'cursor': '', **query})
+            )
+            pagination = RecipePagination()
+            pagination.paginate_queryset(queryset, request, count=12345)
+            self.assertEqual(pagination.total, total, query)
+        request = Request(
+            APIRequestFactory().get('/', {'cursor': '', 'count': 'estimate'})
+        )
+        pagination = RecipePagination()
+        pagination.paginate_queryset(queryset, request, count=12345)
+        self.assertNotEqual(pagination.total, 12345)
+
+    def test_retrieve(self):
+        for client in (self.anonymous, self.client):
+            self.clear_caches()
+            response = client.get(self.url('detail', self.recipe.pk))
+            self.assertEqual(response.status_code, 200)
+            self.assertQueryBudget(response)
+
+    def test_create(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        response = self.author_client.post(
+            self.url('list'), self.recipe_data('new'), format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertQueryBudget(response)
+
+    def test_partial_update(self):
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        self.clear_caches()
+        data = self.recipe_data('changed')
+        data['image'] = image_data_uri('blue')
+        # Removes, adds and changes a row, and invalidates the cart.
+        data['ingredients'] = [
+            {'id': self.ingredients[0].id, 'amount': 20},
+            {'id': self.ingredients[1].id, 'amount': 10},
+            {'id': self.ingredients[3].id, 'amount': 10},
+        ]
+        response = self.author_client.patch(
+            self.url('detail', self.recipe.pk), data, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        # The updated recipe is read again for the response.
+        self.assertQueryBudget(response, max_repeated=1)
+
+    def test_partial_update_applies_ingredient_diff(self):
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        url = self.url('download-shopping-cart')
+        b''.join(self.client.get(url).streaming_content)
+        rows = {
+            row.ingredient_id: row.pk
+            for row in self.recipe.recipe_ingredients.all()
+        }
+        first, second, removed, added = self.ingredients[:4]
+        data = self.recipe_data()
+        data['ingredients'] = [
+            {'id': first.id, 'amount': 10},
+            {'id': second.id, 'amount': 25},
+            {'id': added.id, 'amount': 5},
+        ]
+        response = self.author_client.patch(
+            self.url('detail', self.recipe.pk), data, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            {(item['id'], item['amount'])
+             for item in response.data['ingredients']},
+            {(first.id, 10), (second.id, 25), (added.id, 5)}
+        )
+        stored = {
+            row.ingredient_id: row
+            for row in self.recipe.recipe_ingredients.all()
+        }
+        # Unchanged and changed rows are kept, not recreated.
+        self.assertEqual(stored[first.id].pk, rows[first.id])
+        self.assertEqual(stored[second.id].pk, rows[second.id])
+        self.assertEqual(stored[second.id].amount, 25)
+        self.assertNotIn(removed.id, stored)
+        content = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertIn(f'- {second.name} (g) - 25', content)
+        self.assertIn(f'- {added.name} (g) - 5', content)
+        self.assertNotIn(removed.name, content)
+
+    def test_destroy(self):
+        self.client.post(self.url('favorite', self.recipe.pk))
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        self.clear_caches()
+        response = self.author_client.delete(
+            self.url('detail', self.recipe.pk)
+        )
+        self.assertEqual(response.status_code, 204)
+        # Each deleted favorite and cart row marks the score stale.
+        self.assertQueryBudget(response, max_repeated=1)
+
+    def test_favorite_and_shopping_cart(self):
+        for name in ('favorite', 'shopping-cart'):
+            url = self.url(name, self.recipe.pk)
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 201, response.data)
+            # The recipe is fetched by the view and by the serializer.
+            self.assertQueryBudget(response, max_repeated=1)
+            self.assertEqual(self.client.post(url).status_code, 400)
+            self.clear_caches()
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, 204)
+            self.assertQueryBudget(response)
+            self.assertEqual(self.client.delete(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.recipe.cart_count, 0)
+
+    def test_full_save_keeps_counters(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.client.post(self.url('favorite', self.recipe.pk))
+        stale.name = 'pancakes'
+        stale.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'pancakes')
+        self.assertEqual(self.recipe.favorites_count, 1)
+        # Not mistaken for a renditions-only save: the search vector
+        # follows the new name.
+        response = self.anonymous.get(
+            self.url('list'), {'search': 'pancakes'}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.pk]
+        )
+        Recipe.objects.filter(pk=stale.pk).delete()
+        with self.assertRaises(DatabaseError):
+            stale.save()
+
+    def test_favorite_and_shopping_cart_flags(self):
+        self.client.post(self.url('favorite', self.recipe.pk))
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.cart_count, 1)
+        response = self.client.get(self.url('detail', self.recipe.pk))
+        self.assertIs(response.data['is_favorited'], True)
+        self.assertIs(response.data['is_in_shopping_cart'], True)
+        response = self.author_client.get(
+            self.url('detail', self.recipe.pk)
+        )
+        self.assertIs(response.data['is_favorited'], False)
+        self.assertIs(response.data['is_in_shopping_cart'], False)
+
+    def test_download_shopping_cart(self):
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        self.clear_caches()
+        # The body streams after the middleware has returned.
+        with self.assertMaxQueries(2):
+            response = self.client.get(self.url('download-shopping-cart'))
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content).decode()
+        for ingredient in self.ingredients[:3]:
+            self.assertIn(f'- {ingredient.name} (g) - 10', content)
+        self.assertNotIn(self.ingredients[3].name, content)
+
+    def test_download_shopping_cart_formats(self):
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        url = self.url('download-shopping-cart')
+        expected = [
+            [ingredient.name, 'g', '10']
+            for ingredient in self.ingredients[:3]
+        ]
+
+        def download(media_type, extension, **kwargs):
+            response = self.client.get(url, **kwargs)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertTrue(response['Content-Type'].startswith(media_type))
+            self.assertEqual(
+                response['Content-Disposition'],
+                f'attachment; filename=shopping_list.{extension}'
+            )
+            return b''.join(response.streaming_content)
+
+        content = download('text/plain', 'txt').decode()
+        self.assertTrue(content.startswith('Shopping List:'))
+        for name, unit, total in expected:
+            self.assertIn(f'- {name} ({unit}) - {total}', content)
+        for kwargs in ({'data': {'format': 'csv'}},
+                       {'HTTP_ACCEPT': 'text/csv'}):
+            content = download('text/csv', 'csv', **kwargs).decode()
+            self.assertEqual(
+                list(csv.reader(StringIO(content))),
+                [['name', 'measurement_unit', 'total']] + expected
+            )
+        content = download(
+            'application/json', 'json', data={'format': 'json'}
+        )
+        self.assertEqual(json.loads(content), [
+            {'name': name, 'measurement_unit': unit, 'total': int(total)}
+            for name, unit, total in expected
+        ])
+        content = download('application/pdf', 'pdf', data={'format': 'pdf'})
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        for name, unit, total in expected:
+            self.assertIn(
+                f'(- {name} \\({unit}\\) - {total}) Tj'.encode(), content
+            )
+        response = self.client.get(url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_shopping_list_combines_compatible_units(self):
+        units = {
+            ('flour', 'г'): 500, ('flour', 'кг'): 2,
+            ('milk', 'мл'): 200, ('milk', 'л'): 1, ('milk', 'ст. л.'): 2,
+            ('sugar', 'г'): 100, ('sugar', 'стакан'): 1,
+            ('eggs', 'шт.'): 3,
+        }
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in units
+        )
+        items = [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient, amount in zip(ingredients, units.values())
+        ]
+        # Split over two recipes, so totals span recipes too.
+        for name, share in (('first', items[::2]), ('second', items[1::2])):
+            data = self.recipe_data(name)
+            data['ingredients'] = share
+            response = self.author_client.post(
+                self.url('list'), data, format='json'
+            )
+            self.assertEqual(response.status_code, 201, response.data)
+            self.client.post(self.url('shopping-cart', response.data['id']))
+        response = self.client.get(
+            self.url('download-shopping-cart'), {'format': 'json'}
+        )
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [
+            {'name': 'eggs', 'measurement_unit': 'шт.', 'total': 3},
+            {'name': 'flour', 'measurement_unit': 'г', 'total': 2500},
+            {'name': 'milk', 'measurement_unit': 'мл', 'total': 1230},
+            {'name': 'sugar', 'measurement_unit': 'г', 'total': 100},
+            {'name': 'sugar', 'measurement_unit': 'мл', 'total': 200},
+        ])
+
+    def test_shopping_list_follows_ingredient_rename(self):
+        self.client.post(self.url('shopping-cart', self.recipe.pk))
+        url = self.url('download-shopping-cart')
+        b''.join(self.client.get(url).streaming_content)
+        ingredient = self.ingredients[0]
+        ingredient.name = 'renamed'
+        ingredient.measurement_unit = 'kg'
+        ingredient.save()
+        content = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertIn('- renamed (g) - 10000', content)
+        self.assertNotIn('ingredient 0', content)
+
+    def test_feed(self):
+        self.client.post(
+            reverse('api:user-subscribe', args=[self.author.pk])
+        )
+        self.clear_caches()
+        response = self.client.get(self.url('feed'), {'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertQueryBudget(response)
+
+    @override_settings(FEED_FANOUT_WORKERS=1)
+    def test_fan_out_runs_off_the_request(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            recipe = self.create_recipe(self.author_client, 'fanned out')
+        self.assertFalse(any(
+            FeedEntry._meta.db_table in query['sql'] for query in queries
+        ))
+        executor = feed.get_executor()
+        # The single worker has finished the fan-out and the backfill.
+        executor.submit(connections.close_all).result()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), 2
+        )
+        response = self.client.get(self.url('feed'))
+        self.assertEqual(response.data['results'][0]['id'], recipe.pk)
+
+    def test_pantry(self):
+        response = self.client.get(
+            self.url('pantry'),
+            {'ingredients': ','.join(
+                str(ingredient.id) for ingredient in self.ingredients[:2]
+            )}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertQueryBudget(response)
+
+    def test_pantry_rebuilds_in_background(self):
+        url = self.url('pantry')
+        query = {'ingredients': self.ingredients[4].id, 'max_missing': 3}
+        self.assertEqual(self.client.get(url, query).data['count'], 0)
+        # Not journaled: only a rebuild from the database sees it.
+        IngredientInRecipe.objects.bulk_create([IngredientInRecipe(
+            recipe=self.recipe, ingredient=self.ingredients[4], amount=1
+        )])
+        pantry.expire_index()
+        self.assertEqual(self.client.get(url, query).data['count'], 0)
+        pantry.wait_for_rebuild()
+        response = self.client.get(url, query)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.pk]
+        )
+
+    def test_short_link(self):
+        response = self.client.get(self.url('get-link', self.recipe.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(response)
+        self.clear_caches()
+        response = self.client.get(response.data['short-link'])
+        self.assertEqual(response.status_code, 301)
+        self.assertQueryBudget(response)
+        self.assertEqual(
+            response['Location'], self.url('detail', self.recipe.pk)
+        )
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.recipe.pk)
+        self.assertEqual(response.data['name'], self.recipe.name)
+
+    def test_ingredient_search_ranks_prefix_matches_first(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='g')
+            for name in ('sea salt', 'pepper', 'salted butter', 'Salt',
+                         'basalt flakes')
+        )
+        url = reverse('api:ingredient-list')
+        for enabled in (True, False):
+            with override_settings(INGREDIENT_CATALOG_ENABLED=enabled):
+                self.clear_caches()
+                names = [
+                    item['name'] for item in
+                    self.anonymous.get(url, {'search': 'SALT'}).data
+                ]
+                self.assertEqual(names, [
+                    'Salt', 'salted butter', 'basalt flakes', 'sea salt'
+                ], enabled)
+                response = self.anonymous.get(
+                    url, {'search': 'salt', 'limit': 3}
+                )
+                self.assertEqual(
+                    [item['name'] for item in response.data], names[:3]
+                )
+                response = self.anonymous.get(url, {'name': 'sal'})
+                self.assertEqual(
+                    [item['name'] for item in response.data], names[:2]
+                )
+
+    @override_settings(QUERY_SERVER_TIMING=False)
+    def test_server_timing_is_staff_only(self):
+        url = self.url('detail', self.recipe.pk)
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.clear_caches()
+        self.assertIn('Server-Timing', self.client.get(url))
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    def url(self, name, *args):
+        return reverse(f'api:user-{name}', args=args)
+
+    def test_list(self):
+        for client in (self.anonymous, self.client):
+            self.clear_caches()
+            response = client.get(self.url('list'))
+            self.assertEqual(response.status_code, 200)
+            self.assertQueryBudget(response)
+
+    def test_retrieve_and_me(self):
+        response = self.client.get(self.url('detail', self.author.pk))
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(response)
+        self.clear_caches()
+        response = self.client.get(self.url('me'))
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(response)
+
+    def test_create(self):
+        response = self.anonymous.post(self.url('list'), {
+            'username': 'new', 'email': 'new@example.com',
+            'first_name': 'new', 'last_name': 'new',
+            'password': 'Pass12345!',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertQueryBudget(response)
+
+    def test_set_password(self):
+        response = self.client.post(self.url('set-password'), {
+            'current_password': 'Pass12345!', 'new_password': 'Pass54321!',
+        }, format='json')
+        self.assertEqual(response.status_code, 204, response.data)
+        self.assertQueryBudget(response)
+
+    def test_subscribe(self):
+        url = self.url('subscribe', self.author.pk)
+        response = self.client.post(url, {'recipes_limit': 2})
+        self.assertEqual(response.status_code, 201, response.data)
+        # The author is fetched by the view, the serializer and the
+        # feed backfill.
+        self.assertQueryBudget(response, max_repeated=2)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.subscribers_count, 1)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.clear_caches()
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertQueryBudget(response)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.subscribers_count, 0)
+
+    def test_subscriptions(self):
+        Subscription.objects.create(user=self.user, author=self.author)
+        response = self.client.get(
+            self.url('subscriptions'), {'recipes_limit': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertQueryBudget(response)
+        author = response.data['results'][0]
+        self.assertEqual(author['id'], self.author.pk)
+        self.assertIs(author['is_subscribed'], True)
+        self.assertEqual(author['recipes_count'], 1)
+        self.assertEqual(
+            [recipe['id'] for recipe in author['recipes']], [self.recipe.pk]
+        )
+
+    def test_me_avatar(self):
+        url = self.url('user-avatar')
+        response = self.client.put(
+            url, {'avatar': image_data_uri()}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        # The user is saved again with its renditions, which repeats
+        # the author profile signal handlers.
+        self.assertQueryBudget(response, max_repeated=2)
+        self.clear_caches()
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        self.assertQueryBudget(response)
+
+
+class AsyncReadTests(QueryBudgetTestCase):
+    """The async read views answer exactly like the sync viewsets."""
+
+    compared_headers = (
+        'ETag', 'Last-Modified', 'Location', 'Cache-Control',
+        'WWW-Authenticate',
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.client.post(
+            reverse('api:recipe-favorite', args=[self.recipe.pk])
+        )
+        self.client.post(
+            reverse('api:recipe-shopping-cart', args=[self.recipe.pk])
+        )
+        self.short_link = self.client.get(
+            reverse('api:recipe-get-link', args=[self.recipe.pk])
+        ).data['short-link']
+        self.token = Token.objects.get(user=self.user).key
+
+    def get_async(self, url, **headers):
+        self.assertTrue(iscoroutinefunction(
+            resolve(url.split('?')[0], urlconf=AsyncReadURLConf).func
+        ))
+        with override_settings(ROOT_URLCONF=AsyncReadURLConf):
+            return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+    def assertSameResponse(self, response, expected):
+        self.assertEqual(response.status_code, expected.status_code)
+        for header in self.compared_headers:
+            self.assertEqual(response.get(header), expected.get(header))
+        self.assertEqual(
+            {value.strip() for value in response.get('Vary', '').split(',')},
+            {value.strip() for value in expected.get('Vary', '').split(',')}
+        )
+        if expected.content:
+            self.assertEqual(
+                json.loads(response.content), json.loads(expected.content)
+            )
+        else:
+            self.assertEqual(response.content, b'')
+
+    def test_async_views_match_sync_views(self):
+        recipe_url = reverse('api:recipe-list')
+        ingredient_url = reverse('api:ingredient-list')
+        urls = (
+            recipe_url,
+            f'{recipe_url}?limit=1&page=1',
+            f'{recipe_url}?page=99',
+            f'{recipe_url}?is_favorited=1&is_in_shopping_cart=1',
+            f'{recipe_url}?author={self.author.pk}&search=recipe',
+            f'{recipe_url}?ordering=popular',
+            f'{recipe_url}?ordering=unknown',
+            reverse('api:recipe-detail', args=[self.recipe.pk]),
+            reverse('api:recipe-detail', args=[self.recipe.pk + 1000]),
+            self.short_link.replace('http://testserver', ''),
+            f'{ingredient_url}?name=ingredient',
+            f'{ingredient_url}?search=dient 3&limit=2',
+        )
+        clients = (
+            (self.anonymous, {}),
+            (self.client, {'Authorization': f'Token {self.token}'}),
+            (APIClient(), {'Authorization': 'Token invalid'}),
+        )
+        clients[2][0].credentials(HTTP_AUTHORIZATION='Token invalid')
+        for client, headers in clients:
+            for url in urls:
+                with self.subTest(url=url, headers=headers):
+                    # Version tokens in the ETag are random per cache.
+                    self.clear_caches()
+                    expected = client.get(url)
+                    response = self.get_async(url, **headers)
+                    self.assertSameResponse(response, expected)
+                    if expected.get('ETag'):
+                        response = self.get_async(
+                            url, If_None_Match=expected['ETag'], **headers
+                        )
+                        self.assertEqual(response.status_code, 304)
+
+    def test_async_list_shows_viewer_flags(self):
+        response = self.get_async(
+            reverse('api:recipe-list'), Authorization=f'Token {self.token}'
+        )
+        recipe = json.loads(response.content)['results'][0]
+        self.assertTrue(recipe['is_favorited'])
+        self.assertTrue(recipe['is_in_shopping_cart'])
+
+
+class BenchmarkTests(TransactionTestCase):
+    """benchmark_api requests resolve under the project's ROOT_URLCONF."""
+
+    def tearDown(self):
+        QueryBudgetTestCase.clear_caches()
+
+    def test_benchmark_scenarios_succeed(self):
+        generate_dataset(users=10, recipes=20, follows=3, cart_size=2,
+                         favorites=2)
+        report = run_benchmark(InProcessDriver(), count=3, warmup=0)
+        self.assertEqual(set(report['scenarios']), set(SCENARIOS))
+        for name, summary in report['scenarios'].items():
+            self.assertEqual(summary['requests'], 3, name)
+            self.assertEqual(summary['errors'], 0, name)
+
+
+class ChecksTests(SimpleTestCase):
+    def test_async_read_views_need_short_lived_connections(self):
+        database = connections.settings['default']
+        for enabled, max_age, warned in (
+            (False, 60, False),
+            (True, 0, False),
+            (True, 60, True),
+        ):
+            with override_settings(ASYNC_READ_VIEWS=enabled), \
+                    mock.patch.dict(database, CONN_MAX_AGE=max_age):
+                self.assertEqual(
+                    [error.id for error in check_async_connections(None)],
+                    ['common.W002'] if warned else []
+                )
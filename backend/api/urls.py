@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
@@ -12,7 +13,22 @@ router.register('users', CustomUserViewSet)
 router.register('recipes', RecipeViewSet)
 router.register('ingredients', IngredientViewSet)
 
-urlpatterns = [
+
+def async_read_patterns():
+    """Routes of the async read views, matched before the viewsets."""
+    from .views import async_read
+
+    return [
+        path('recipes/', async_read.recipe_list),
+        path('recipes/<int:pk>/', async_read.recipe_detail),
+        path('recipes/s/<str:short_hash>/', async_read.recipe_short_link),
+        path('ingredients/', async_read.ingredient_list),
+    ]
+
+
+async_patterns = async_read_patterns() if settings.ASYNC_READ_VIEWS else []
+
+urlpatterns = async_patterns + [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('recipes/s/<str:short_hash>/',
@@ -0,0 +1,262 @@
+"""Async GET handlers for the hottest read endpoints.
+
+Routed instead of the viewsets when ASYNC_READ_VIEWS is set and served
+under ASGI, so a slow query no longer pins a worker. Other methods, the
+browsable API and keyset cursors are passed on to the sync viewsets.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from common.authentication import CachedTokenAuthentication
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse, HttpResponsePermanentRedirect
+from django.urls import reverse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from recipes.cache import (aget_recipe_list_version, aget_viewer_versions,
+                           recipe_fragment_key)
+from recipes.catalog import get_catalog
+from recipes.models import Recipe
+from recipes.shortlinks import SHORT_LINK_TIMEOUT, aresolve_short_id
+from rest_framework import status
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotFound)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+from users.models import Subscription
+
+from ..serializers.recipe import (IngredientSerializer, aload_fragments,
+                                  with_viewer)
+from .recipe import (IngredientViewSet, RecipeViewSet, list_validators,
+                     recipe_etag, set_validators)
+
+recipe_list_view = RecipeViewSet.as_view(
+    {'get': 'list', 'post': 'create'}, basename='recipe', detail=False
+)
+recipe_detail_view = RecipeViewSet.as_view(
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy'
+    },
+    basename='recipe',
+    detail=True
+)
+recipe_short_link_view = RecipeViewSet.as_view(
+    {'get': 'get_by_short_link'}
+)
+ingredient_list_view = IngredientViewSet.as_view(
+    {'get': 'list'}, basename='ingredient', detail=False
+)
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    """Render data as the viewsets' JSONRenderer would; None as no body."""
+    if data is None:
+        response = HttpResponse(status=status_code)
+        del response['Content-Type']
+    else:
+        response = HttpResponse(
+            JSONRenderer().render(data),
+            content_type=JSONRenderer.media_type,
+            status=status_code
+        )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def render_response(response):
+    """Turn a DRF Response built by a viewset method into JSON."""
+    rendered = render(response.data, response.status_code)
+    for header, value in response.items():
+        if header not in ('Content-Type', 'Vary'):
+            rendered[header] = value
+    return rendered
+
+
+def error_response(exc):
+    if isinstance(exc, AuthenticationFailed):
+        exc.auth_header = CachedTokenAuthentication.keyword
+    return render_response(exception_handler(exc, {}))
+
+
+def accepts_json(request):
+    return (
+        'format' not in request.GET
+        and 'text/html' not in request.headers.get('Accept', '')
+    )
+
+
+def async_read(sync_view):
+    """Serve GET and HEAD with the decorated coroutine.
+
+    Other methods, and requests for which the coroutine returns None, go
+    to sync_view. The view carries the viewset class and actions, which
+    QueryInstrumentationMiddleware reads the query budgets from.
+    """
+    sync_handler = sync_to_async(sync_view)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD') and accepts_json(request):
+                try:
+                    response = await handler(request, *args, **kwargs)
+                except APIException as exc:
+                    response = error_response(exc)
+                if response is not None:
+                    return response
+            return await sync_handler(request, *args, **kwargs)
+
+        view.cls = sync_view.cls
+        view.actions = sync_view.actions
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def get_request(request):
+    """Wrap request for DRF filters and pagination, authenticated async."""
+    result = await CachedTokenAuthentication().aauthenticate(request)
+    drf_request = Request(request)
+    drf_request.user, drf_request.auth = result or (AnonymousUser(), None)
+    return drf_request
+
+
+def get_view(viewset, request, action, **kwargs):
+    return viewset(
+        request=request,
+        action=action,
+        format_kwarg=None,
+        args=(),
+        kwargs=kwargs
+    )
+
+
+async def get_etag(request, validators):
+    viewer_versions = ()
+    if request.user.is_authenticated:
+        viewer_versions = await aget_viewer_versions(request.user.id)
+    return recipe_etag(
+        request, JSONRenderer.media_type, validators, viewer_versions
+    )
+
+
+async def render_recipes(request, recipes):
+    """Recipes as RecipeListSerializer renders them for the viewer."""
+    fragments = await aload_fragments(recipes)
+    subscribed = set()
+    if request.user.is_authenticated and recipes:
+        subscribed = {
+            author_id async for author_id in Subscription.objects.filter(
+                user=request.user,
+                author_id__in={recipe.author_id for recipe in recipes}
+            ).values_list('author_id', flat=True)
+        }
+    return [
+        with_viewer(
+            fragments[recipe_fragment_key(recipe)],
+            request,
+            recipe.author_id in subscribed,
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart
+        )
+        for recipe in recipes
+    ]
+
+
+@async_read(recipe_list_view)
+async def recipe_list(request):
+    if RecipeViewSet.pagination_class.cursor_query_param in request.GET:
+        return None
+    request = await get_request(request)
+    view = get_view(RecipeViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    pagination = view.paginator
+    # Page numbers need the total; the paginator would count synchronously.
+    pagination.known_count = await queryset.acount()
+    paginator = pagination.django_paginator_class(
+        queryset, pagination.get_page_size(request)
+    )
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(
+            page_number=page_number, message=str(exc)
+        ))
+    pagination.request = request
+    pagination.keyset = False
+    recipes = [
+        recipe async for recipe in pagination.page.object_list.aiterator()
+    ]
+    etag = await get_etag(request, list_validators(
+        await aget_recipe_list_version(),
+        recipes,
+        pagination.get_paginated_response([]).data
+    ))
+    if get_conditional_response(request._request, etag=etag) is not None:
+        return set_validators(
+            render(None, status.HTTP_304_NOT_MODIFIED), etag
+        )
+    results = await render_recipes(request, recipes)
+    return set_validators(
+        render(pagination.get_paginated_response(results).data), etag
+    )
+
+
+@async_read(recipe_detail_view)
+async def recipe_detail(request, pk):
+    request = await get_request(request)
+    view = get_view(RecipeViewSet, request, 'retrieve', pk=pk)
+    try:
+        recipe = await view.filter_queryset(view.get_queryset()).aget(pk=pk)
+    except (Recipe.DoesNotExist, DjangoValidationError, ValueError):
+        raise NotFound()
+    last_modified = None
+    if not request.user.is_authenticated:
+        last_modified = recipe.updated_at
+    etag = await get_etag(request, (recipe.pk, recipe.updated_at))
+    if get_conditional_response(
+        request._request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp())
+    ) is not None:
+        return set_validators(
+            render(None, status.HTTP_304_NOT_MODIFIED), etag, last_modified
+        )
+    results = await render_recipes(request, [recipe])
+    return set_validators(render(results[0]), etag, last_modified)
+
+
+@async_read(recipe_short_link_view)
+async def recipe_short_link(request, short_hash):
+    # Authenticate anyway, so invalid tokens get 401 as on the sync path.
+    await get_request(request)
+    pk = await aresolve_short_id(short_hash)
+    if pk is None:
+        raise NotFound()
+    response = HttpResponsePermanentRedirect(
+        reverse('api:recipe-detail', args=[pk])
+    )
+    patch_cache_control(response, public=True, max_age=SHORT_LINK_TIMEOUT)
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+@async_read(ingredient_list_view)
+async def ingredient_list(request):
+    request = await get_request(request)
+    view = get_view(IngredientViewSet, request, 'list')
+    if settings.INGREDIENT_CATALOG_ENABLED:
+        # Usually a version check; reloads read the table synchronously.
+        catalog = await sync_to_async(get_catalog)()
+        return render_response(view.catalog_list(catalog))
+    queryset = view.filter_queryset(view.get_queryset())
+    ingredients = [ingredient async for ingredient in queryset.aiterator()]
+    return render(IngredientSerializer(ingredients, many=True).data)
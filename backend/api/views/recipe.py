@@ -1,24 +1,83 @@
+import hashlib
+
 from api.filters import IngredientFilter, RecipeFilter
 from api.permissions import IsAuthorOrReadOnly
-from django.db.models import Sum
-from django.http import HttpResponse
+from common.pagination import (CustomPageNumberPagination, FeedPagination,
+                               RecipePagination)
+from django.conf import settings
+from django.http import (HttpResponsePermanentRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes.cache import (RECIPE_FRAGMENT_VERSION, get_recipe_list_version,
+                           get_viewer_versions, iter_shopping_list)
+from recipes.catalog import get_catalog
+from recipes.exporters import SHOPPING_LIST_EXPORTERS, buffer_chunks
+from recipes.feed import get_feed
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.pantry import match_pantry
+from recipes.shortlinks import (SHORT_LINK_TIMEOUT, assign_short_id,
+                                resolve_short_id)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from ..serializers.recipe import (FavoriteCreateSerializer,
                                   IngredientSerializer,
+                                  PantryRecipeSerializer,
                                   RecipeCreateUpdateSerializer,
                                   RecipeListSerializer,
                                   RecipeMinifiedSerializer,
                                   ShoppingCartCreateSerializer)
 
 
+def list_validators(list_version, recipes, envelope):
+    """ETag validators of a recipe list page.
+
+    The body is fully determined by the page rows, whose updated_at
+    every change to a rendered recipe touches, and by the pagination
+    envelope (count and links, without results). The list version,
+    bumped on recipe writes and score refreshes, is a cheap guard
+    against updates that bypass updated_at.
+    """
+    return (
+        list_version,
+        envelope['count'],
+        envelope['next'],
+        envelope['previous'],
+        *((recipe.pk, recipe.updated_at) for recipe in recipes)
+    )
+
+
+def recipe_etag(request, media_type, validators, viewer_versions):
+    parts = [
+        RECIPE_FRAGMENT_VERSION,
+        request.build_absolute_uri(),
+        media_type,
+        *validators,
+        *viewer_versions
+    ]
+    return quote_etag(
+        hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    """Validator and revalidation headers of recipe responses."""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -26,26 +85,121 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    search_limit_default = 20
+    search_limit_max = 100
+    cache_max_age = 300
+
+    def get_search_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return self.search_limit_default
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required'})
+        if limit < 1:
+            raise ValidationError(
+                {'limit': 'Ensure this value is greater than or equal to 1'}
+            )
+        return min(limit, self.search_limit_max)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and 'search' in self.request.query_params:
+            return queryset[:self.get_search_limit()]
+        return queryset
+
+    def catalog_response(self, catalog, get_data):
+        """Serve catalog data with an ETag tied to the catalog version."""
+        etag = quote_etag(catalog.version)
+        not_modified = get_conditional_response(
+            self.request._request, etag=etag
+        )
+        if not_modified is not None:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(get_data())
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=self.cache_max_age
+        )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_ENABLED:
+            return super().list(request, *args, **kwargs)
+        return self.catalog_list(get_catalog())
+
+    def catalog_list(self, catalog):
+        params = self.request.query_params
+        if 'search' in params:
+            limit = self.get_search_limit()
+            return self.catalog_response(
+                catalog, lambda: catalog.search(params['search'], limit)
+            )
+        if 'name' in params:
+            return self.catalog_response(
+                catalog, lambda: catalog.prefix(params['name'])
+            )
+        return self.catalog_response(catalog, lambda: catalog.items)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_CATALOG_ENABLED:
+            return super().retrieve(request, *args, **kwargs)
+        catalog = get_catalog()
+        try:
+            ingredient = catalog.get(int(kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise NotFound()
+        return self.catalog_response(catalog, lambda: ingredient)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = (Recipe.objects.select_related('author')
-                .prefetch_related(
-                    'recipe_ingredients__ingredient',
-                    'favorited_by',
-                    'in_shopping_carts'
-                ))
+    # Ingredients are prefetched by RecipeListSerializer, only for
+    # recipes whose cached representation is missing.
+    queryset = Recipe.objects.select_related('author')
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    pantry_max_ingredients = 100
+    # Upper bounds for an authenticated request with cold caches on
+    # PostgreSQL, independent of page size; enforced by
+    # QueryInstrumentationMiddleware (see common.queries) and api.tests.
+    # Writes include the on-commit search vector updates and, with
+    # IMAGE_RENDITION_WORKERS=0 and FEED_FANOUT_WORKERS=0, the rendition
+    # save and the feed fan-out; create assumes fewer than
+    # FANOUT_BATCH_SIZE subscribers. The shopping list streams after
+    # the middleware returns and is checked by the tests.
+    query_budgets = {
+        'list': 6,
+        'retrieve': 5,
+        'create': 18,
+        'partial_update': 17,
+        'destroy': 15,
+        'favorite': 7,
+        'shopping_cart': 7,
+        'feed': 7,
+        'pantry': 6,
+        'get_link': 2,
+        'get_by_short_link': 2,
+    }
+    pantry_max_missing_default = 2
 
     def get_permissions(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'pantry'):
             return [AllowAny()]
-        elif self.action in ('favorite', 'shopping_cart', 'download_shopping_cart'):
+        elif self.action in (
+            'favorite', 'shopping_cart', 'download_shopping_cart', 'feed'
+        ):
             return [IsAuthenticated()]
         return super().get_permissions()
 
+    def get_queryset(self):
+        return super().get_queryset().with_user_annotations(self.request.user)
+
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return RecipeCreateUpdateSerializer
@@ -54,6 +208,64 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def conditional_response(self, validators, get_data, last_modified=None):
+        """Answer 304 when the ETag derived from validators still matches.
+
+        The ETag also covers the URL, the media type and the viewer's
+        collection versions, so get_data only runs on a mismatch.
+        """
+        request = self.request
+        viewer_versions = (
+            get_viewer_versions(request.user.id)
+            if request.user.is_authenticated else ()
+        )
+        etag = recipe_etag(
+            request, request.accepted_media_type, validators, viewer_versions
+        )
+        not_modified = get_conditional_response(
+            request._request,
+            etag=etag,
+            last_modified=last_modified and int(last_modified.timestamp())
+        )
+        if not_modified is not None:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(get_data())
+        return set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        # Counts only when the pagination mode needs the total.
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        validators = list_validators(
+            get_recipe_list_version(),
+            page,
+            self.get_paginated_response([]).data
+        )
+
+        def get_data():
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
+
+        return self.conditional_response(validators, get_data)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Detail with an ETag; anonymous viewers also get Last-Modified.
+
+        Viewer flags change without touching updated_at, so Last-Modified
+        alone would only be a valid validator for anonymous responses.
+        """
+        instance = self.get_object()
+        return self.conditional_response(
+            (instance.pk, instance.updated_at),
+            lambda: self.get_serializer(instance).data,
+            last_modified=(
+                None if request.user.is_authenticated
+                else instance.updated_at
+            )
+        )
+
     def handle_collection(self, request, pk, collection_class, serializer_class, messages):
         if request.method == 'POST':
             recipe = get_object_or_404(Recipe, id=pk)
@@ -111,39 +323,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
             }
         )
 
-    def generate_shopping_list(self, ingredients):
-        shopping_list = ['Shopping List:\n\n']
-        for item in ingredients:
-            shopping_list.append(
-                f"- {item['recipe__recipe_ingredients__ingredient__name']} "
-                f"({item['recipe__recipe_ingredients__ingredient__measurement_unit']}) "
-                f"- {item['total']}\n"
-            )
-        return ''.join(shopping_list)
-
     @action(
         detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_EXPORTERS
     )
     def download_shopping_cart(self, request):
-        ingredients = request.user.shopping_cart.values(
-            'recipe__recipe_ingredients__ingredient__name',
-            'recipe__recipe_ingredients__ingredient__measurement_unit'
-        ).annotate(
-            total=Sum('recipe__recipe_ingredients__amount')
-        ).order_by('recipe__recipe_ingredients__ingredient__name')
-
-        shopping_list_text = self.generate_shopping_list(ingredients)
-
-        response = HttpResponse(
-            shopping_list_text,
-            content_type='text/plain'
+        exporter = request.accepted_renderer
+        response = StreamingHttpResponse(
+            buffer_chunks(exporter.stream(iter_shopping_list(request.user))),
+            content_type=exporter.media_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_list.txt'
+            f'attachment; filename=shopping_list.{exporter.extension}'
         )
         return response
 
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """Recipes of followed authors, newest first, keyset paginated."""
+        def fetch(position, limit):
+            rows = get_feed(request.user, position, limit)
+            recipes = self.get_queryset().in_bulk(
+                [recipe_id for _, recipe_id in rows]
+            )
+            return [
+                recipes[recipe_id] for _, recipe_id in rows
+                if recipe_id in recipes
+            ]
+
+        paginator = FeedPagination()
+        page = paginator.paginate_feed(fetch, request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_pantry_params(self):
+        params = self.request.query_params
+        values = [
+            value.strip()
+            for param in params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        ]
+        try:
+            pantry = {int(value) for value in values}
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'A list of ingredient ids is required'}
+            )
+        if not pantry:
+            raise ValidationError(
+                {'ingredients': 'At least one ingredient is required'}
+            )
+        if len(pantry) > self.pantry_max_ingredients:
+            raise ValidationError({
+                'ingredients': 'Ensure there are no more than '
+                               f'{self.pantry_max_ingredients} ingredients'
+            })
+        max_missing = params.get('max_missing')
+        if max_missing is None:
+            return pantry, self.pantry_max_missing_default
+        try:
+            max_missing = int(max_missing)
+        except ValueError:
+            raise ValidationError(
+                {'max_missing': 'A valid integer is required'}
+            )
+        if max_missing < 0:
+            raise ValidationError(
+                {'max_missing': 'Ensure this value is not negative'}
+            )
+        return pantry, max_missing
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        """Recipes that can be cooked from the given ingredients."""
+        pantry, max_missing = self.get_pantry_params()
+        paginator = CustomPageNumberPagination()
+        page = paginator.paginate_queryset(
+            match_pantry(pantry, max_missing), request, view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, missing, matched in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.missing_count = missing
+            recipe.matched_count = matched
+            results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['get'],
@@ -151,13 +425,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_name='get-link'
     )
     def get_link(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
+        recipe = get_object_or_404(Recipe.objects.only('short_id'), id=pk)
+        short_id = recipe.short_id or assign_short_id(recipe)
         short_url = request.build_absolute_uri(
-            reverse('recipes:recipe-short-link', args=[recipe.short_id])
+            reverse('api:recipe-short-link', args=[short_id])
         )
         return Response({'short-link': short_url})
 
     def get_by_short_link(self, request, short_hash):
-        recipe = get_object_or_404(Recipe, short_id=short_hash)
-        serializer = self.get_serializer(recipe)
-        return Response(serializer.data) 
\ No newline at end of file
+        """Permanently redirect a short link to the recipe."""
+        pk = resolve_short_id(short_hash)
+        if pk is None:
+            raise NotFound()
+        response = HttpResponsePermanentRedirect(
+            reverse('api:recipe-detail', args=[pk])
+        )
+        patch_cache_control(response, public=True, max_age=SHORT_LINK_TIMEOUT)
+        return response 
\ No newline at end of file
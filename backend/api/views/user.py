@@ -1,4 +1,4 @@
-from django.db.models import Count
+from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -33,6 +33,16 @@ class CustomUserViewSet(SubscriptionMixin, UserViewSet):
     serializer_class = CustomUserSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = UserFilter
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'me': 2,
+        'create': 3,
+        'set_password': 4,
+        'subscribe': 12,
+        'subscriptions': 4,
+        'me_avatar': 9,
+    }
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
@@ -41,6 +51,17 @@ class CustomUserViewSet(SubscriptionMixin, UserViewSet):
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_subscribed=Exists(
+                Subscription.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -50,19 +71,20 @@ class CustomUserViewSet(SubscriptionMixin, UserViewSet):
         author = get_object_or_404(User, id=id)
 
         if request.method == 'POST':
+            limit = self.get_recipes_limit()
             serializer = SubscriptionCreateSerializer(
                 data={'author': author.id},
                 context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
-            author_with_count = User.objects.annotate(
-                recipes_count=Count('recipes')
-            ).get(id=author.id)
+            author_with_recipes = self.with_recipes_preview(
+                User.objects.filter(id=author.id), limit
+            ).get()
             return Response(
                 SubscriptionSerializer(
-                    author_with_count,
-                    context={'request': request}
+                    author_with_recipes,
+                    context=self.get_subscription_context(limit)
                 ).data,
                 status=status.HTTP_201_CREATED
             )
@@ -83,15 +105,16 @@ class CustomUserViewSet(SubscriptionMixin, UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
+        limit = self.get_recipes_limit()
         queryset = self.filter_queryset(self.get_queryset())
-        queryset = queryset.filter(subscribing__user=request.user).annotate(
-            recipes_count=Count('recipes')
+        queryset = self.with_recipes_preview(
+            queryset.filter(subscribing__user=request.user), limit
         )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             page,
             many=True,
-            context={'request': request}
+            context=self.get_subscription_context(limit)
         )
         return self.get_paginated_response(serializer.data)
 
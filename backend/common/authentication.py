@@ -0,0 +1,129 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_cache_key(key):
+    """Shared cache key for a token; the raw token never becomes a key."""
+    return f'auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class LocalTokenCache:
+    """Bounded per-process LRU of cache key -> (expiry, token).
+
+    Size and TTL are read from TOKEN_CACHE_LOCAL_SIZE and
+    TOKEN_CACHE_LOCAL_TTL on every call; a TTL of 0 disables it.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, token = entry
+            if expires_at < time.monotonic():
+                del self.entries[cache_key]
+                return None
+            self.entries.move_to_end(cache_key)
+            return token
+
+    def set(self, cache_key, token):
+        ttl = settings.TOKEN_CACHE_LOCAL_TTL
+        if ttl <= 0:
+            return
+        with self.lock:
+            self.entries[cache_key] = (time.monotonic() + ttl, token)
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > settings.TOKEN_CACHE_LOCAL_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, cache_keys):
+        with self.lock:
+            for cache_key in cache_keys:
+                self.entries.pop(cache_key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_tokens = LocalTokenCache()
+
+
+def forget_tokens(keys):
+    """Drop tokens from the shared cache and this process's LRU.
+
+    Other processes may keep serving a forgotten token from their LRU
+    for up to TOKEN_CACHE_LOCAL_TTL seconds.
+    """
+    cache_keys = [token_cache_key(key) for key in keys]
+    cache.delete_many(cache_keys)
+    local_tokens.delete(cache_keys)
+
+
+class TokenKeyParser(TokenAuthentication):
+    """Parses the Authorization header exactly like TokenAuthentication."""
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication without the per-request token/user query.
+
+    Tokens with their user are looked up in the process-local LRU, then
+    in the shared cache and only then in the database. Entries are
+    dropped when a token is deleted (logout) and when its user is saved
+    (password change, deactivation, profile edits), see common.signals.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = local_tokens.get(cache_key)
+        if token is None:
+            token = cache.get(cache_key)
+            if token is None:
+                user, token = super().authenticate_credentials(key)
+                cache.set(cache_key, token, settings.TOKEN_CACHE_TIMEOUT)
+            local_tokens.set(cache_key, token)
+        # Views may modify request.user; keep the cached instance intact.
+        return copy.copy(token.user), token
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate() for async views."""
+        key = TokenKeyParser().authenticate(request)
+        if key is None:
+            return None
+        cache_key = token_cache_key(key)
+        token = local_tokens.get(cache_key)
+        if token is None:
+            token = await cache.aget(cache_key)
+            if token is None:
+                token = await self.aget_token(key)
+                await cache.aset(
+                    cache_key, token, settings.TOKEN_CACHE_TIMEOUT
+                )
+            local_tokens.set(cache_key, token)
+        return copy.copy(token.user), token
+
+    async def aget_token(self, key):
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return token
@@ -0,0 +1,381 @@
+"""Synthetic dataset and request driver for benchmarking the API.
+
+The dataset is plain committed rows whose usernames start with
+BENCH_PREFIX, so that an out-of-process server (gunicorn) can be
+benchmarked as well as the in-process test client.
+"""
+import json
+import random
+import re
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from recipes.catalog import bump_catalog_version
+from recipes.feed import rebuild_feeds
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart)
+from recipes.ranking import refresh_stale_scores
+from recipes.search import update_search_vectors
+from recipes.shortlinks import encode_short_id
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscription, User
+
+from .queries import record_queries
+
+BENCH_PREFIX = 'bench_'
+BENCH_PASSWORD = 'bench-password'
+BENCH_INGREDIENT_PREFIX = 'bench ingredient'
+BENCH_UNITS = ('г', 'кг', 'мл', 'л', 'шт.')
+BATCH_SIZE = 1000
+SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def zipf_weights(size, skew):
+    """Weights of a power-law (Zipf) distribution over size ranks."""
+    return [1 / (rank + 1) ** skew for rank in range(size)]
+
+
+def power_law_subscriptions(rng, users, follows, skew):
+    """Pairs (user_id, author_id) where few authors get most followers."""
+    weights = zipf_weights(len(users), skew)
+    subscriptions = set()
+    for user in users:
+        for author in rng.choices(users, weights, k=follows):
+            if author.pk != user.pk:
+                subscriptions.add((user.pk, author.pk))
+    return subscriptions
+
+
+def get_ingredient_ids(rng, minimum=200):
+    ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+    if len(ingredient_ids) >= minimum:
+        return ingredient_ids
+    Ingredient.objects.bulk_create(
+        Ingredient(
+            name=f'{BENCH_INGREDIENT_PREFIX} {number}',
+            measurement_unit=rng.choice(BENCH_UNITS)
+        )
+        for number in range(minimum)
+    )
+    bump_catalog_version()
+    return list(Ingredient.objects.values_list('pk', flat=True))
+
+
+def generate_dataset(users=1000, recipes=5000, follows=20, skew=1.1,
+                     cart_size=8, favorites=10, seed=42):
+    """Create a reproducible dataset and return its row counts.
+
+    Followers and recipe authorship follow a Zipf distribution, as do
+    favorites and cart items over recipes. Rows are bulk-created, so the
+    denormalized counters, scores, feeds and search vectors are rebuilt
+    afterwards the same way the maintenance commands do it.
+    """
+    rng = random.Random(seed)
+    ingredient_ids = get_ingredient_ids(rng)
+    password = make_password(BENCH_PASSWORD)
+    created_users = User.objects.bulk_create(
+        (
+            User(
+                username=f'{BENCH_PREFIX}{number}',
+                email=f'{BENCH_PREFIX}{number}@example.com',
+                first_name='Bench',
+                last_name=f'User {number}',
+                password=password
+            )
+            for number in range(users)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    Token.objects.bulk_create(
+        (Token(key=Token.generate_key(), user=user) for user in created_users),
+        batch_size=BATCH_SIZE
+    )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user_id=user_id, author_id=author_id)
+            for user_id, author_id in power_law_subscriptions(
+                rng, created_users, follows, skew
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    author_weights = zipf_weights(len(created_users), skew)
+    created_recipes = Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author=rng.choices(created_users, author_weights)[0],
+                name=f'Bench recipe {number}',
+                text=f'Benchmark recipe number {number}',
+                cooking_time=rng.randint(5, 180),
+                image='recipes/images/bench.png'
+            )
+            for number in range(recipes)
+        ),
+        batch_size=BATCH_SIZE
+    )
+    now = timezone.now()
+    for recipe in created_recipes:
+        recipe.pub_date = now - timedelta(minutes=rng.randint(0, 525600))
+        recipe.short_id = encode_short_id(recipe.pk)
+    Recipe.objects.bulk_update(
+        created_recipes, ('pub_date', 'short_id'), batch_size=BATCH_SIZE
+    )
+    IngredientInRecipe.objects.bulk_create(
+        (
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe in created_recipes
+            for ingredient_id in rng.sample(
+                ingredient_ids, rng.randint(3, 12)
+            )
+        ),
+        batch_size=BATCH_SIZE
+    )
+
+    recipe_weights = zipf_weights(len(created_recipes), skew)
+    for model, size in ((Favorite, favorites), (ShoppingCart, cart_size)):
+        model.objects.bulk_create(
+            (
+                model(user=user, recipe=recipe)
+                for user in created_users
+                for recipe in {
+                    recipe.pk: recipe for recipe in rng.choices(
+                        created_recipes, recipe_weights,
+                        k=rng.randint(0, 2 * size)
+                    )
+                }.values()
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+    call_command('reconcile_counters', stdout=StringIO())
+    update_search_vectors(recipe.pk for recipe in created_recipes)
+    refresh_stale_scores()
+    rebuild_feeds()
+    return dataset_summary()
+
+
+def flush_dataset():
+    """Delete the dataset.
+
+    Subscription, favorite and cart rows are deleted without their
+    per-row signal handlers: their users are deleted right after.
+    """
+    users = User.objects.filter(username__startswith=BENCH_PREFIX)
+    FeedEntry.objects.filter(user__in=users).delete()
+    for model in (Subscription, Favorite, ShoppingCart):
+        queryset = model.objects.filter(user__in=users)
+        queryset._raw_delete(queryset.db)
+    users.delete()
+    Ingredient.objects.filter(
+        name__startswith=BENCH_INGREDIENT_PREFIX
+    ).delete()
+    bump_catalog_version()
+
+
+def dataset_summary():
+    users = User.objects.filter(username__startswith=BENCH_PREFIX)
+    return {
+        'users': users.count(),
+        'recipes': Recipe.objects.filter(author__in=users).count(),
+        'subscriptions': Subscription.objects.filter(user__in=users).count(),
+        'favorites': Favorite.objects.filter(user__in=users).count(),
+        'cart_items': ShoppingCart.objects.filter(user__in=users).count(),
+        'ingredients': Ingredient.objects.count(),
+    }
+
+
+def build_requests(rng, count):
+    """Return {scenario: [(path, token or None), ...]} for the dataset."""
+    users = User.objects.filter(username__startswith=BENCH_PREFIX)
+    tokens = dict(
+        Token.objects.filter(user__in=users).values_list('user_id', 'key')
+    )
+    if not tokens:
+        return {}
+    token_list = list(tokens.values())
+    subscribers = list(
+        users.filter(subscriber__isnull=False).distinct()
+        .values_list('pk', flat=True)
+    )
+    cart_owners = list(
+        users.filter(shopping_cart__isnull=False).distinct()
+        .values_list('pk', flat=True)
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(author__in=users).values_list('pk', flat=True)
+    )
+    prefixes = sorted({
+        name[:rng.randint(2, 3)].lower()
+        for name in Ingredient.objects.values_list('name', flat=True)[:2000]
+    })
+    pages = max(1, len(recipe_ids) // 6)
+    list_url = reverse('api:recipe-list')
+    return {
+        'recipe_list': [
+            (f'{list_url}?page={rng.randint(1, min(pages, 50))}',
+             rng.choice(token_list))
+            for _ in range(count)
+        ],
+        'recipe_detail': [
+            (reverse('api:recipe-detail', args=[rng.choice(recipe_ids)]),
+             rng.choice(token_list))
+            for _ in range(count)
+        ],
+        'subscriptions': [
+            (reverse('api:user-subscriptions'),
+             tokens[rng.choice(subscribers)])
+            for _ in range(count)
+        ] if subscribers else [],
+        'ingredient_autocomplete': [
+            (f'{reverse("api:ingredient-list")}?name={rng.choice(prefixes)}',
+             None)
+            for _ in range(count)
+        ],
+        'shopping_list_download': [
+            (reverse('api:recipe-download-shopping-cart'),
+             tokens[rng.choice(cart_owners)])
+            for _ in range(count)
+        ] if cart_owners else [],
+    }
+
+
+class InProcessDriver:
+    """Runs requests through the Django test client."""
+
+    name = 'test-client'
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def request(self, path, token):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        with record_queries() as stats:
+            started = time.perf_counter()
+            response = self.client.get(path, **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, stats.count
+
+
+class HttpDriver:
+    """Runs requests against a live server, e.g. a local gunicorn.
+
+    Query counts are read from the Server-Timing header set by
+    QueryInstrumentationMiddleware, so start the server with
+    QUERY_SERVER_TIMING=True.
+    """
+
+    name = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, path, token):
+        request = urllib.request.Request(self.base_url + path)
+        if token:
+            request.add_header('Authorization', f'Token {token}')
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING_QUERIES_RE.search(
+            headers.get('Server-Timing', '')
+        )
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+def summarize(results):
+    """Aggregate (status, seconds, queries) tuples of one scenario."""
+    timings = [elapsed * 1000 for _, elapsed, _ in results]
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'requests': len(results),
+        'errors': sum(status >= 400 for status, _, _ in results),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries_per_request': (
+            round(statistics.mean(queries), 2) if queries else None
+        ),
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run_scenario(driver, requests, warmup):
+    for path, token in requests[:warmup]:
+        driver.request(path, token)
+    return summarize([driver.request(path, token) for path, token in requests])
+
+
+def run_concurrent(driver, requests, warmup, concurrency):
+    """Keep concurrency requests in flight; only for the HttpDriver.
+
+    Latencies then include time spent queued by the server, which is
+    what distinguishes a worker blocked on the database from one that
+    is not.
+    """
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda args: driver.request(*args),
+                          requests[:warmup]))
+        started = time.perf_counter()
+        results = list(executor.map(lambda args: driver.request(*args),
+                                    requests))
+        elapsed = time.perf_counter() - started
+    summary = summarize(results)
+    summary['throughput_rps'] = round(len(results) / elapsed, 1)
+    return summary
+
+
+def run_benchmark(driver, count=200, warmup=20, scenarios=None, seed=42,
+                  label='', concurrency=1):
+    """Run every scenario and return a JSON-serializable report."""
+    rng = random.Random(seed)
+    results = {}
+    for name, requests in build_requests(rng, count).items():
+        if scenarios and name not in scenarios or not requests:
+            continue
+        if concurrency > 1:
+            results[name] = run_concurrent(
+                driver, requests, warmup, concurrency
+            )
+        else:
+            results[name] = run_scenario(driver, requests, warmup)
+    return {
+        'label': label,
+        'created_at': timezone.now().isoformat(),
+        'driver': driver.name,
+        'concurrency': concurrency,
+        'database': connection.vendor,
+        'dataset': dataset_summary(),
+        'scenarios': results,
+    }
+
+
+def dump_report(report, stream):
+    json.dump(report, stream, ensure_ascii=False, indent=2)
+    stream.write('\n')
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.core.checks import Tags, Warning, register
+from recipes.cache import SHOPPING_LIST_TIMEOUT
+from rest_framework.settings import api_settings
+
+from .authentication import CachedTokenAuthentication
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Cache-backed state must be shared by all worker processes.
+
+    Cached tokens and the version tokens of shopping carts are
+    invalidated through the default cache. runserver is a single
+    process, so DEBUG skips the check.
+    """
+    if settings.DEBUG or not isinstance(caches['default'], LocMemCache):
+        return []
+    stale = [
+        f'serve old shopping lists and is_in_shopping_cart flags for up '
+        f'to {SHOPPING_LIST_TIMEOUT} seconds'
+    ]
+    if any(
+        issubclass(authentication, CachedTokenAuthentication)
+        for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ):
+        stale.insert(0, (
+            'accept revoked tokens for up to TOKEN_CACHE_TIMEOUT seconds'
+        ))
+    return [Warning(
+        'The default cache is process-local.',
+        hint=(
+            f'Worker processes other than the one handling a change '
+            f'{" and ".join(stale)}. Set CACHE_BACKEND and CACHE_LOCATION '
+            f'to a shared cache such as Redis.'
+        ),
+        id='common.W001',
+    )]
+
+
+@register()
+def check_async_connections(app_configs, **kwargs):
+    """Async views run their queries in changing threads.
+
+    Every thread keeps its own persistent connection, so CONN_MAX_AGE
+    would pile up idle connections until max_connections is reached.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return []
+    return [
+        Warning(
+            f'ASYNC_READ_VIEWS is enabled with persistent connections '
+            f'for database {alias!r}.',
+            hint=(
+                'Set DB_CONN_MAX_AGE=0, or DB_POOL=True to reuse '
+                'connections through the psycopg pool.'
+            ),
+            id='common.W002',
+        )
+        for alias in connections
+        if connections.settings[alias]['CONN_MAX_AGE'] != 0
+    ]
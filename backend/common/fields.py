@@ -1,13 +1,118 @@
 import base64
+import binascii
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from PIL import Image
 from rest_framework import serializers
 
+from .images import current_renditions
+
+# Multiple of 4, so every chunk decodes on its own.
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class DecodedTemporaryFile(TemporaryUploadedFile):
+    """Closed once unreferenced, as the request closes multipart uploads.
+
+    Unlike those, nothing else closes it; close() also tolerates the
+    file having been moved into the storage already.
+    """
+
+    def __del__(self):
+        self.close()
+
 
 class Base64ImageField(serializers.ImageField):
+    """ImageField that also accepts a base64 data URI.
+
+    The payload is decoded chunk by chunk into an upload file, on disk
+    above FILE_UPLOAD_MAX_MEMORY_SIZE like a multipart upload. Its
+    decoded size is checked before decoding and its pixel count from
+    the image header, before Pillow decodes any pixels.
+    """
+
+    default_error_messages = {
+        'too_large': 'Image must not exceed {max_size} bytes.',
+        'too_many_pixels': 'Image must not exceed {max_pixels} pixels.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
-        return super().to_internal_value(data)
\ No newline at end of file
+            data = self.decode(data)
+        return super().to_internal_value(data)
+
+    def decode(self, data):
+        format, _, imgstr = data.partition(';base64,')
+        # Encoders may wrap lines (MIME wraps at 76 columns); chunks must
+        # hold only alphabet characters to decode on their own.
+        imgstr = ''.join(imgstr.split())
+        if not imgstr:
+            self.fail('invalid_image')
+        if len(imgstr) // 4 * 3 > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('too_large', max_size=settings.IMAGE_UPLOAD_MAX_SIZE)
+        content_type = format[len('data:'):]
+        name = f'temp.{content_type.split("/")[-1]}'
+        if len(imgstr) // 4 * 3 > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            file = DecodedTemporaryFile(name, content_type, 0, None)
+        else:
+            file = InMemoryUploadedFile(
+                BytesIO(), None, name, content_type, 0, None
+            )
+        try:
+            for start in range(0, len(imgstr), BASE64_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    imgstr[start:start + BASE64_CHUNK_SIZE], validate=True
+                ))
+            file.size = file.tell()
+            file.seek(0)
+            with Image.open(file) as image:
+                width, height = image.size
+        except (binascii.Error, OSError):
+            file.close()
+            self.fail('invalid_image')
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            file.close()
+            self.fail(
+                'too_many_pixels', max_pixels=settings.IMAGE_MAX_PIXELS
+            )
+        file.seek(0)
+        return file
+
+
+class ImageRenditionsField(serializers.Field):
+    """URLs of the renditions of an image field, None until rendered."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        renditions = current_renditions(instance, self.image_field)
+        if renditions is None:
+            return None
+        storage = getattr(instance, self.image_field).storage
+        request = self.context.get('request')
+        urls = {
+            name: {
+                extension: storage.url(path)
+                for extension, path in (formats or {}).items()
+            }
+            for name, formats in renditions.items()
+        }
+        return absolute_renditions(urls, request) if request else urls
+
+
+def absolute_renditions(renditions, request):
+    """Copy of rendition URLs made absolute, as ImageField does."""
+    return {
+        name: {
+            extension: request.build_absolute_uri(url)
+            for extension, url in formats.items()
+        }
+        for name, formats in renditions.items()
+    }
@@ -0,0 +1,180 @@
+"""Resized renditions of uploaded images, rendered off the request thread.
+
+A model with an image field `<name>` stores the renditions of its
+current file in a JSONField `<name>_renditions`:
+
+    {'source': 'recipes/images/x.png',
+     'thumbnail': {'webp': 'recipes/images/renditions/x_thumbnail.webp',
+                   'jpeg': 'recipes/images/renditions/x_thumbnail.jpeg'},
+     'card': {...}, 'full': {...}}
+
+Renditions whose source is not the current file are stale and ignored.
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger('foodgram.images')
+
+# Bounding boxes; images are only ever scaled down.
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (640, 640),
+    'full': (1600, 1600),
+}
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def current_renditions(instance, field_name):
+    """Renditions of the instance's current image, None if not ready."""
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, renditions_field(field_name))
+    if not field_file or renditions.get('source') != field_file.name:
+        return None
+    return {name: renditions.get(name) for name in RENDITIONS}
+
+
+def available_formats():
+    return {
+        extension: options
+        for extension, options in RENDITION_FORMATS.items()
+        if extension != 'webp' or features.check('webp')
+    }
+
+
+def encode(image, pil_format, options):
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def render_renditions(field_file):
+    """Write every rendition of field_file to its storage.
+
+    Returns the value for the renditions field.
+    """
+    storage = field_file.storage
+    directory, filename = posixpath.split(field_file.name)
+    stem = posixpath.splitext(filename)[0]
+    renditions = {'source': field_file.name}
+    formats = available_formats()
+    with storage.open(field_file.name) as source, Image.open(source) as image:
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValueError(f'{field_file.name} has too many pixels')
+        image = ImageOps.exif_transpose(image)
+        for name, size in RENDITIONS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.Resampling.LANCZOS)
+            renditions[name] = {
+                extension: storage.save(
+                    posixpath.join(
+                        directory, 'renditions',
+                        f'{stem}_{name}.{extension}'
+                    ),
+                    ContentFile(encode(resized, pil_format, options))
+                )
+                for extension, (pil_format, options) in formats.items()
+            }
+    return renditions
+
+
+def generate_renditions(model, pk, field_name, source):
+    """Render and store renditions if the row still has image source.
+
+    Saved with update_fields, so post_save handlers see the change (and
+    auto_now fields move, which invalidates cached representations).
+    """
+    instance = model._default_manager.filter(
+        pk=pk, **{field_name: source}
+    ).first()
+    if instance is None:
+        return
+    renditions = render_renditions(getattr(instance, field_name))
+    update_fields = [renditions_field(field_name)] + [
+        field.name for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+    ]
+    with transaction.atomic():
+        # The image may have been replaced while rendering.
+        instance = model._default_manager.select_for_update().filter(
+            pk=pk, **{field_name: source}
+        ).first()
+        if instance is None:
+            return
+        setattr(instance, renditions_field(field_name), renditions)
+        instance.save(update_fields=update_fields)
+
+
+def generate_renditions_logged(*args):
+    try:
+        generate_renditions(*args)
+    except Exception:
+        logger.exception('Rendering image renditions failed: %r', args)
+
+
+def run_in_worker(*args):
+    """generate_renditions() in a pool thread, wrapped like a request."""
+    close_old_connections()
+    try:
+        generate_renditions_logged(*args)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    # Created lazily so that no thread exists before gunicorn forks.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.IMAGE_RENDITION_WORKERS,
+                thread_name_prefix='image-renditions'
+            )
+        return _executor
+
+
+def schedule_renditions(instance, field_name):
+    """Render renditions of a new image once the transaction commits.
+
+    With IMAGE_RENDITION_WORKERS=0 they are rendered synchronously in
+    the committing thread instead of in the worker pool.
+    """
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, renditions_field(field_name))
+    if not field_file or renditions.get('source') == field_file.name:
+        return
+    args = (type(instance), instance.pk, field_name, field_file.name)
+    if settings.IMAGE_RENDITION_WORKERS > 0:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_worker, *args)
+        )
+    else:
+        transaction.on_commit(lambda: generate_renditions_logged(*args))
@@ -0,0 +1,65 @@
+import sys
+
+from common.benchmark import (HttpDriver, InProcessDriver, dump_report,
+                              run_benchmark)
+from django.core.management.base import BaseCommand, CommandError
+
+SCENARIOS = (
+    'recipe_list',
+    'recipe_detail',
+    'subscriptions',
+    'ingredient_autocomplete',
+    'shopping_list_download',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure p50/p99 latency and queries per request of the API hot '
+        'paths on the generate_benchmark_data dataset; prints JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS, dest='scenarios',
+                            help='Run only this scenario (repeatable)')
+        parser.add_argument('--base-url',
+                            help='Benchmark a running server instead of '
+                                 'the in-process test client, e.g. '
+                                 'http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Requests in flight at once, needs '
+                                 '--base-url')
+        parser.add_argument('--label', default='',
+                            help='Stored in the report, e.g. a commit hash')
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] > 1 and not options['base_url']:
+            raise CommandError('--concurrency needs --base-url')
+        if options['base_url']:
+            driver = HttpDriver(options['base_url'])
+        else:
+            driver = InProcessDriver()
+        report = run_benchmark(
+            driver,
+            count=options['requests'],
+            warmup=options['warmup'],
+            scenarios=options['scenarios'],
+            seed=options['seed'],
+            label=options['label'],
+            concurrency=options['concurrency']
+        )
+        if not report['scenarios']:
+            raise CommandError(
+                'No benchmark data, run generate_benchmark_data first'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                dump_report(report, output)
+        else:
+            dump_report(report, sys.stdout)
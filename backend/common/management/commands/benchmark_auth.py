@@ -0,0 +1,84 @@
+import json
+import time
+
+from common.authentication import (CachedTokenAuthentication, forget_tokens,
+                                   local_tokens)
+from common.benchmark import percentile
+from common.queries import record_queries
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of token authentication with and '
+        'without the token cache; prints JSON. Test rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--tokens', type=int, default=100,
+                            help='Distinct tokens cycled through')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(
+                    username=f'auth_bench_{number}',
+                    email=f'auth_bench_{number}@example.com'
+                )
+                for number in range(options['tokens'])
+            )
+            keys = [
+                token.key for token in Token.objects.bulk_create(
+                    Token(key=Token.generate_key(), user=user)
+                    for user in users
+                )
+            ]
+            factory = RequestFactory()
+            requests = [
+                factory.get('/', HTTP_AUTHORIZATION=f'Token {key}')
+                for key in keys
+            ]
+            count = options['requests']
+            report = {
+                'database': self.measure(
+                    TokenAuthentication(), requests, count
+                ),
+            }
+            with override_settings(TOKEN_CACHE_LOCAL_TTL=0):
+                forget_tokens(keys)
+                report['shared_cache'] = self.measure(
+                    CachedTokenAuthentication(), requests, count
+                )
+            forget_tokens(keys)
+            report['local_cache'] = self.measure(
+                CachedTokenAuthentication(), requests, count
+            )
+            forget_tokens(keys)
+            local_tokens.clear()
+            transaction.set_rollback(True)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def measure(authentication, requests, count):
+        """Authenticate count requests, first pass over tokens excluded."""
+        for request in requests:
+            authentication.authenticate(request)
+        timings = []
+        with record_queries() as stats:
+            for number in range(count):
+                request = requests[number % len(requests)]
+                started = time.perf_counter()
+                authentication.authenticate(request)
+                timings.append((time.perf_counter() - started) * 1000000)
+        return {
+            'p50_us': round(percentile(timings, 0.5), 1),
+            'p99_us': round(percentile(timings, 0.99), 1),
+            'queries_per_request': round(stats.count / count, 2),
+        }
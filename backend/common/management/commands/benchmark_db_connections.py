@@ -0,0 +1,81 @@
+import json
+import time
+
+from common.benchmark import percentile
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import ConnectionHandler
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of getting a database connection '
+        'with connections closed after each request, persistent '
+        'connections and the psycopg pool; prints JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES[DEFAULT_DB_ALIAS]
+        database = {
+            **database,
+            'OPTIONS': {
+                key: value
+                for key, value in database.get('OPTIONS', {}).items()
+                if key != 'pool'
+            },
+        }
+        modes = {
+            'no_reuse': {**database, 'CONN_MAX_AGE': 0},
+            'persistent': {**database, 'CONN_MAX_AGE': None},
+        }
+        if database['ENGINE'] == 'django.db.backends.postgresql':
+            # Imports the driver, so only on PostgreSQL.
+            from django.db.backends.postgresql.psycopg_any import (
+                is_psycopg3
+            )
+            if is_psycopg3:
+                modes['pool'] = {
+                    **database,
+                    'CONN_MAX_AGE': 0,
+                    'OPTIONS': {
+                        **database['OPTIONS'],
+                        'pool': {'min_size': 1, 'max_size': 1},
+                    },
+                }
+        report = {
+            mode: self.measure(mode_database, options['requests'])
+            for mode, mode_database in modes.items()
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    def measure(database, count):
+        """Run count request cycles of one query each on database.
+
+        Each cycle ends the way close_old_connections() ends a request,
+        so the timings include whatever connection setup the mode
+        leaves to the request.
+        """
+        connections = ConnectionHandler({DEFAULT_DB_ALIAS: database})
+        connection = connections[DEFAULT_DB_ALIAS]
+        timings = []
+        # The first cycle connects in every mode and is not measured.
+        for number in range(count + 1):
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            connection.close_if_unusable_or_obsolete()
+            if number:
+                timings.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        if 'pool' in database['OPTIONS']:
+            connection.close_pool()
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+        }
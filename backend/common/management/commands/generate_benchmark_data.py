@@ -0,0 +1,52 @@
+from common.benchmark import (BENCH_PASSWORD, BENCH_PREFIX, dataset_summary,
+                              flush_dataset, generate_dataset)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Create a reproducible benchmark dataset: users with tokens, '
+        'power-law subscriptions, recipes, favorites and carts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Subscriptions per user')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of author popularity')
+        parser.add_argument('--cart-size', type=int, default=8,
+                            help='Mean number of recipes in a cart')
+        parser.add_argument('--favorites', type=int, default=10,
+                            help='Mean number of favorites per user')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--flush', action='store_true',
+                            help='Delete the existing benchmark dataset '
+                                 'first')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['flush']:
+                flush_dataset()
+            elif dataset_summary()['users']:
+                raise CommandError(
+                    'Benchmark data already exists, use --flush'
+                )
+            summary = generate_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                follows=options['follows'],
+                skew=options['skew'],
+                cart_size=options['cart_size'],
+                favorites=options['favorites'],
+                seed=options['seed']
+            )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{key}={value}' for key, value in summary.items())
+        ))
+        self.stdout.write(
+            f'Users are {BENCH_PREFIX}<n>@example.com '
+            f'with password {BENCH_PASSWORD}'
+        )
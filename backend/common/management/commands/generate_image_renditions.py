@@ -0,0 +1,37 @@
+from common.images import generate_renditions, renditions_field
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+from recipes.models import Recipe
+from users.models import User
+
+IMAGE_FIELDS = ((Recipe, 'image'), (User, 'avatar'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Render missing or stale renditions of recipe images and avatars '
+        'synchronously, e.g. for images uploaded before renditions existed'
+    )
+
+    def handle(self, *args, **options):
+        for model, field_name in IMAGE_FIELDS:
+            stale = model.objects.exclude(**{field_name: ''}).annotate(
+                rendered_source=KT(f'{renditions_field(field_name)}__source')
+            ).filter(
+                Q(rendered_source__isnull=True)
+                | ~Q(**{field_name: F('rendered_source')})
+            ).values_list('pk', field_name)
+            total = failed = 0
+            for pk, source in stale.iterator():
+                try:
+                    generate_renditions(model, pk, field_name, source)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{source}: {error}')
+                else:
+                    total += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: renditions of {total} '
+                f'images rendered, {failed} failed'
+            ))
@@ -0,0 +1,31 @@
+class CounterFieldsMixin:
+    """Keep denormalized counter columns out of full-row saves.
+
+    Counters are maintained with F() updates from signal handlers, so
+    saving a stale in-memory instance must not overwrite them. Saving an
+    existing row without update_fields is therefore a save with every
+    concrete field except the counters, which has two visible effects:
+
+    * post_save receivers get that field list as update_fields instead
+      of None, so they must check it for the fields they care about
+      rather than treat any list as a narrow save;
+    * a row deleted in the meantime raises DatabaseError instead of
+      being inserted again.
+
+    Counters are written on creation, or when listed in update_fields.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
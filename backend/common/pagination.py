@@ -1,6 +1,176 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def before_position(queryset, position, pk_field='pk'):
+    """Rows after position in (-pub_date, -pk_field) order.
+
+    The plain pub_date bound gives the (..., pub_date, id) indexes a
+    start point at the cursor; the OR alone is not an index condition,
+    so the scan would start at the newest row and filter its way down.
+    """
+    if position is None:
+        return queryset
+    pub_date, pk = position
+    return queryset.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{pk_field}__lt': pk}),
+        pub_date__lte=pub_date
+    )
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
-    max_page_size = 100 
\ No newline at end of file
+    max_page_size = 100
+
+
+class RecipePagination(CustomPageNumberPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    Passing `cursor` (empty for the first page) switches to keyset
+    pagination on (pub_date, id), which avoids OFFSET scans on deep
+    pages. In that mode `count` selects how the total is computed:
+    `none` (default) skips it, `estimate` uses the PostgreSQL planner
+    statistics and `exact` runs COUNT(*).
+
+    Callers that already know the exact size of queryset pass it as
+    `count`. It replaces the COUNT query where one would run (page
+    numbers and `count=exact`) and never overrides `none` or `estimate`.
+    """
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('none', 'estimate', 'exact')
+    invalid_cursor_message = 'Invalid cursor'
+    known_count = None
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = DjangoPaginator(object_list, per_page)
+        if self.known_count is not None:
+            paginator.count = self.known_count
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        self.known_count = count
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = self.get_total(queryset, request)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        queryset = before_position(queryset, position)
+        return self.trim_page(
+            list(queryset.order_by('-pub_date', '-pk')[:self.page_size + 1])
+        )
+
+    def trim_page(self, results):
+        """Cut one look-ahead row off results and remember the cursor."""
+        self.next_position = None
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            self.next_position = (results[-1].pub_date, results[-1].pk)
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.total),
+            ('next', self.get_next_cursor_link()),
+            ('previous', None),
+            ('results', data)
+        ]))
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(*self.next_position)
+        )
+
+    @staticmethod
+    def encode_cursor(pub_date, pk):
+        value = f'{pub_date.isoformat()}|{pk}'.encode()
+        return base64.urlsafe_b64encode(value).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            pub_date, pk = value.split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_total(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'none')
+        if mode not in self.count_modes or mode == 'none':
+            return None
+        if mode == 'estimate':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+        if self.known_count is not None:
+            return self.known_count
+        return queryset.count()
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Row estimate from PostgreSQL statistics, None if unavailable."""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        queryset = queryset.order_by()
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return int(row[0])
+            return None
+        plan = json.loads(queryset.explain(format='json'))
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan['Plan']['Plan Rows'])
+
+
+class FeedPagination(RecipePagination):
+    """Keyset-only pagination for rows that do not come from a queryset.
+
+    `fetch(position, limit)` must return up to limit objects with
+    pub_date and pk, newest first, strictly after position.
+    """
+
+    def paginate_feed(self, fetch, request):
+        self.keyset = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.total = None
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        return self.trim_page(fetch(position, self.page_size + 1))
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('foodgram.queries')
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE'
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """Shape of a query with literals and IN lists collapsed."""
+    normalized = NUMBER_RE.sub('?', IN_LIST_RE.sub('IN (...)', sql))
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class QueryStats:
+    """SQL statistics collected for one request or block of code."""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if not sql.startswith(TRANSACTION_STATEMENTS):
+                self.record_shape(sql)
+
+    def record_shape(self, sql):
+        key, normalized = fingerprint(sql)
+        self.shapes[key] += 1
+        self.statements.setdefault(key, normalized)
+
+    @property
+    def repeated(self):
+        """Fingerprints executed more than once, e.g. by an N+1 loop."""
+        return {key: count for key, count in self.shapes.items() if count > 1}
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def as_dict(self):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.duration * 1000, 2),
+            'budget': self.budget,
+            'repeated': [
+                {'fingerprint': key, 'count': count,
+                 'sql': self.statements[key][:200]}
+                for key, count in self.repeated.items()
+            ],
+        }
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries", '
+            f'db-repeated;desc="{sum(self.repeated.values())}"'
+        )
+
+
+def wrap_connections(stack, stats):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(stats))
+
+
+@contextmanager
+def record_queries(budget=None):
+    """Collect QueryStats for every database connection inside the block."""
+    stats = QueryStats(budget)
+    with ExitStack() as stack:
+        wrap_connections(stack, stats)
+        yield stats
+
+
+def get_view_budget(view_func, method):
+    """Budget declared as query_budgets = {action: max_queries} on a view."""
+    view_class = getattr(view_func, 'cls', None)
+    budgets = getattr(view_class, 'query_budgets', None)
+    if not budgets:
+        return None
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    return budgets.get(action)
+
+
+class QueryInstrumentationMiddleware:
+    """Record per-request query count, DB time and repeated query shapes.
+
+    Results go to the `foodgram.queries` logger as JSON and, when
+    QUERY_SERVER_TIMING is set or the user is staff, to the
+    Server-Timing header. Requests exceeding their view's query budget
+    are logged as warnings, or fail when QUERY_BUDGET_STRICT is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.query_budget = None
+        with record_queries() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        """Async requests run their queries through sync_to_async.
+
+        Connections are thread-local, so the wrappers are installed and
+        removed in the request's thread-sensitive executor, which is
+        where the async ORM runs its queries too.
+        """
+        request.query_budget = None
+        stats = QueryStats()
+        stack = ExitStack()
+        await sync_to_async(wrap_connections)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        stats.budget = request.query_budget
+        if self.exposes_timing(request):
+            response['Server-Timing'] = stats.server_timing()
+        response.query_stats = stats
+        self.log(request, response, stats)
+        if stats.over_budget and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path} ran {stats.count} '
+                f'queries, budget is {stats.budget}'
+            )
+        return response
+
+    @staticmethod
+    def exposes_timing(request):
+        """Query counts and DB time are not for anonymous clients."""
+        if settings.QUERY_SERVER_TIMING:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_view_budget(view_func, request.method)
+
+    def log(self, request, response, stats):
+        if stats.over_budget:
+            level = logging.WARNING
+        elif stats.repeated:
+            level = logging.INFO
+        else:
+            level = logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        logger.log(level, json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **stats.as_dict(),
+        }, ensure_ascii=False))
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+from .images import schedule_renditions
+
+User = get_user_model()
+
+
+def schedule_forget_tokens(keys):
+    """Forget tokens once committed, so no request re-caches old rows."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: forget_tokens(keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    schedule_forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def token_user_saved(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None and set(update_fields) <= {'last_login'}
+    ):
+        return
+    schedule_forget_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(sender, instance, **kwargs):
+    schedule_renditions(instance, 'avatar')
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+from django.test import override_settings
+
+from .queries import record_queries
+
+
+class QueryBudgetMixin:
+    """TestCase mixin enforcing the query_budgets declared on views.
+
+    Every request made through the test client fails with
+    QueryBudgetExceeded when its view action runs more queries than its
+    budget. assertQueryBudget() additionally checks for repeated query
+    shapes, which usually means a per-row query slipped in.
+    """
+
+    max_repeated_queries = 0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._query_budget_settings = override_settings(
+            QUERY_INSTRUMENTATION=True, QUERY_BUDGET_STRICT=True
+        )
+        cls._query_budget_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._query_budget_settings.disable()
+        super().tearDownClass()
+
+    def assertQueryBudget(self, response, max_repeated=None):
+        if max_repeated is None:
+            max_repeated = self.max_repeated_queries
+        stats = response.query_stats
+        repeated = sum(count - 1 for count in stats.repeated.values())
+        if repeated > max_repeated:
+            self.fail(
+                f'{repeated} repeated queries (allowed {max_repeated}): '
+                f'{stats.as_dict()["repeated"]}'
+            )
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """Like assertNumQueries, but only fails above the budget."""
+        with record_queries(budget) as stats:
+            yield stats
+        if stats.over_budget:
+            self.fail(
+                f'{stats.count} queries executed, budget is {budget}: '
+                f'{list(stats.statements.values())}'
+            )
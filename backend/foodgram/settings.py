@@ -12,6 +12,7 @@ SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-default-key-for-dev')
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
 
 MIDDLEWARE = [
+    'common.queries.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,7 +41,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
 ]
 
-ROOT_URLCONF = 'api.urls'
+ROOT_URLCONF = 'foodgram.urls'
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
@@ -59,6 +60,10 @@ TEMPLATES = [
     },
 ]
 
+# Serve recipe list/detail, short links and ingredient autocomplete with
+# async views; run under ASGI (foodgram.asgi) to benefit.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
 DATABASES = {
     'default': {
         'HOST': os.getenv('DB_HOST', 'localhost'),
@@ -67,9 +72,111 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'foodgram_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'password'),
         'NAME': os.getenv('POSTGRES_DB', 'foodgram'),
+        # Seconds a connection is reused across requests; 0 closes it
+        # after every request. Keep 0 under ASGI, where each request may
+        # run in a different thread (see common.checks); use DB_POOL
+        # there instead.
+        'CONN_MAX_AGE': int(
+            os.getenv('DB_CONN_MAX_AGE', 0 if ASYNC_READ_VIEWS else 60)
+        ),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+        ),
+    }
+}
+
+# psycopg 3 connection pool, one per worker process, instead of
+# persistent connections. A sync gunicorn worker runs one request at a
+# time, so DB_POOL_MAX_SIZE=1 (or the --threads count) suffices; under
+# ASGI it caps the queries a worker runs at once. Size the deployment
+# so that workers * DB_POOL_MAX_SIZE stays below Postgres
+# max_connections minus the connections needed by migrations, cron
+# commands and admin sessions.
+if os.getenv('DB_POOL', 'False') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 4)),
+            # Seconds a request waits for a free connection.
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Must be shared by the worker processes in production, e.g. Redis as in
+# infra/docker-compose.yml: LocMemCache is per process, so a revoked
+# token or an old shopping cart version stays cached in other workers
+# (see common.checks).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+INGREDIENT_CATALOG_ENABLED = os.getenv('INGREDIENT_CATALOG_ENABLED', 'True') == 'True'
+
+RECIPE_TRENDING_HALF_LIFE_HOURS = float(
+    os.getenv('RECIPE_TRENDING_HALF_LIFE_HOURS', 48)
+)
+
+FEED_FANOUT_MAX_SUBSCRIBERS = int(
+    os.getenv('FEED_FANOUT_MAX_SUBSCRIBERS', 10000)
+)
+# Threads per process writing feed fan-out and subscription backfill
+# (recipes.feed); 0 writes them synchronously once the change commits.
+FEED_FANOUT_WORKERS = int(os.getenv('FEED_FANOUT_WORKERS', 1))
+
+SHORT_LINK_KEY = os.getenv('SHORT_LINK_KEY', 'foodgram-short-links')
+
+# Token -> user cache of CachedTokenAuthentication. A revoked token stays
+# valid in other worker processes for up to TOKEN_CACHE_LOCAL_TTL seconds.
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 300))
+TOKEN_CACHE_LOCAL_TTL = float(os.getenv('TOKEN_CACHE_LOCAL_TTL', 5))
+TOKEN_CACHE_LOCAL_SIZE = int(os.getenv('TOKEN_CACHE_LOCAL_SIZE', 10000))
+
+# Base64 image uploads (common.fields.Base64ImageField): decoded size
+# and pixel count limits, checked before Pillow decodes the image.
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv('IMAGE_UPLOAD_MAX_SIZE', 5242880))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 25000000))
+
+# Threads per process rendering image renditions (common.images); 0
+# renders them synchronously once the upload is committed.
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+QUERY_INSTRUMENTATION = os.getenv('QUERY_INSTRUMENTATION', 'True') == 'True'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+# Server-Timing with query count and DB time for every client; staff
+# users always get it.
+QUERY_SERVER_TIMING = os.getenv('QUERY_SERVER_TIMING', str(DEBUG)) == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'foodgram.images': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -103,7 +210,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'common.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'common.pagination.CustomPageNumberPagination',
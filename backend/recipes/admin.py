@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
+from .cache import (SHOPPING_LIST_CHUNK_SIZE, aggregate_shopping_list,
+                    bump_recipe_carts)
+from .exporters import CsvExporter, buffer_chunks
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart)
 
@@ -15,11 +19,13 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'favorites_count')
     search_fields = ('name', 'author__username')
     list_filter = ('author', 'name')
+    readonly_fields = ('favorites_count', 'cart_count')
     inlines = (IngredientInRecipeInline,)
 
-    def favorites_count(self, obj):
-        return obj.favorited_by.count()
-    favorites_count.short_description = 'In favorites'
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            bump_recipe_carts([form.instance.pk])
 
 
 @admin.register(Ingredient)
@@ -38,4 +44,20 @@ class FavoriteAdmin(admin.ModelAdmin):
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user__username', 'recipe__name') 
\ No newline at end of file
+    search_fields = ('user__username', 'recipe__name')
+    actions = ('export_shopping_list',)
+
+    @admin.action(description='Export aggregated shopping list (CSV)')
+    def export_shopping_list(self, request, queryset):
+        exporter = CsvExporter()
+        rows = aggregate_shopping_list(queryset).iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE
+        )
+        response = StreamingHttpResponse(
+            buffer_chunks(exporter.stream(rows)),
+            content_type=exporter.media_type
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename=shopping_list.csv'
+        )
+        return response 
\ No newline at end of file
@@ -0,0 +1,151 @@
+import uuid
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .models import ShoppingCart
+from .units import canonical_unit, unit_factor
+
+SHOPPING_LIST_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CACHE_MAX_ROWS = 5000
+SHOPPING_LIST_CHUNK_SIZE = 2000
+RECIPE_FRAGMENT_TIMEOUT = 60 * 60 * 24
+# Bump whenever the cached recipe representation changes shape.
+RECIPE_FRAGMENT_VERSION = 2
+
+
+# Bumped by every recipe write, see recipes.signals.
+RECIPE_LIST_VERSION_KEY = 'recipes:version'
+
+# Per-user collections shown in recipe responses as viewer flags.
+VIEWER_COLLECTIONS = ('favorites', 'shopping_cart', 'subscriptions')
+
+
+def collection_version_key(collection, user_id):
+    return f'{collection}:version:{user_id}'
+
+
+def cart_version_key(user_id):
+    return collection_version_key('shopping_cart', user_id)
+
+
+def get_versions(keys):
+    """Return the version tokens under keys, creating missing ones.
+
+    A random token (rather than a counter) keeps an evicted version key
+    from ever resurrecting stale cached data.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(keys):
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def get_cart_version(user_id):
+    return get_versions([cart_version_key(user_id)])[0]
+
+
+def get_viewer_versions(user_id):
+    """Version tokens of the user's favorites, cart and subscriptions."""
+    return get_versions([
+        collection_version_key(collection, user_id)
+        for collection in VIEWER_COLLECTIONS
+    ])
+
+
+async def aget_viewer_versions(user_id):
+    return await aget_versions([
+        collection_version_key(collection, user_id)
+        for collection in VIEWER_COLLECTIONS
+    ])
+
+
+def get_recipe_list_version():
+    return get_versions([RECIPE_LIST_VERSION_KEY])[0]
+
+
+async def aget_recipe_list_version():
+    return (await aget_versions([RECIPE_LIST_VERSION_KEY]))[0]
+
+
+def bump_recipe_list_version():
+    cache.delete(RECIPE_LIST_VERSION_KEY)
+
+
+def bump_collection_versions(collection, user_ids):
+    cache.delete_many([
+        collection_version_key(collection, user_id) for user_id in user_ids
+    ])
+
+
+def bump_cart_versions(user_ids):
+    bump_collection_versions('shopping_cart', user_ids)
+
+
+def bump_recipe_carts(recipe_ids):
+    """Invalidate the shopping lists of everyone who has the recipes."""
+    bump_cart_versions(
+        ShoppingCart.objects.filter(recipe_id__in=list(recipe_ids))
+        .values_list('user_id', flat=True).distinct()
+    )
+
+
+def recipe_fragment_key(recipe):
+    """Cache key of a recipe's viewer-independent representation.
+
+    The key embeds updated_at, so every save of the recipe, its
+    ingredients or its author's profile (see Recipe.objects.touch) makes
+    the old fragment unreachable without explicit deletes.
+    """
+    version = int(recipe.updated_at.timestamp() * 1000000)
+    return f'recipe:{RECIPE_FRAGMENT_VERSION}:{recipe.pk}:{version}'
+
+
+def aggregate_shopping_list(carts):
+    """Sum ingredient amounts over a ShoppingCart queryset.
+
+    Compatible units (g/kg, ml/l/tsp/tbsp, ...) are converted to their
+    canonical unit inside the query, so they are summed into one line.
+    """
+    unit = 'recipe__recipe_ingredients__ingredient__measurement_unit'
+    return carts.values(
+        name=F('recipe__recipe_ingredients__ingredient__name'),
+        measurement_unit=canonical_unit(unit)
+    ).annotate(
+        total=Sum(F('recipe__recipe_ingredients__amount') * unit_factor(unit))
+    ).order_by('name', 'measurement_unit')
+
+
+def iter_shopping_list(user):
+    """Yield the user's aggregated shopping list rows.
+
+    Cached lists are replayed as is. Otherwise rows are read through a
+    server-side cursor and cached once the whole list has been read,
+    unless it grows past SHOPPING_LIST_CACHE_MAX_ROWS.
+    """
+    key = f'shopping_list:{user.id}:{get_cart_version(user.id)}'
+    shopping_list = cache.get(key)
+    if shopping_list is not None:
+        yield from shopping_list
+        return
+    rows = aggregate_shopping_list(ShoppingCart.objects.filter(user=user))
+    shopping_list = []
+    for row in rows.iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE):
+        if shopping_list is not None:
+            shopping_list.append(row)
+            if len(shopping_list) > SHOPPING_LIST_CACHE_MAX_ROWS:
+                shopping_list = None
+        yield row
+    if shopping_list is not None:
+        cache.set(key, shopping_list, timeout=SHOPPING_LIST_TIMEOUT)
@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Ingredient
+
+CATALOG_VERSION_KEY = 'ingredients:version'
+CATALOG_MAX_AGE = 300
+
+
+class IngredientCatalog:
+    """Immutable, sorted in-memory snapshot of the ingredient table.
+
+    Rows are kept ordered by lower-cased name so that prefix lookups are
+    two binary searches, and are stored already serialized.
+    """
+
+    def __init__(self, version, rows):
+        rows = sorted(
+            (name.lower(), pk, name, unit) for pk, name, unit in rows
+        )
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.keys = [row[0] for row in rows]
+        self.items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in rows
+        ]
+        self.by_id = {item['id']: item for item in self.items}
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def prefix_range(self, term):
+        term = term.lower()
+        start = bisect_left(self.keys, term)
+        end = bisect_left(self.keys, term + '\U0010ffff', lo=start)
+        return start, end
+
+    def prefix(self, term):
+        start, end = self.prefix_range(term)
+        return self.items[start:end]
+
+    def search(self, term, limit):
+        """Prefix matches first, then substring matches, up to limit."""
+        start, end = self.prefix_range(term)
+        results = self.items[start:min(end, start + limit)]
+        if len(results) == limit:
+            return results
+        term = term.lower()
+        for index, key in enumerate(self.keys):
+            if start <= index < end or term not in key:
+                continue
+            results.append(self.items[index])
+            if len(results) == limit:
+                break
+        return results
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache.delete(CATALOG_VERSION_KEY)
+
+
+def get_catalog():
+    """Return the process-local catalog, reloading it when stale.
+
+    The version stamp lives in the shared cache, so with a shared backend
+    every worker reloads right after an ingredient write. CATALOG_MAX_AGE
+    bounds staleness when the cache is process-local.
+    """
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if (
+        catalog is not None
+        and catalog.version == version
+        and time.monotonic() - catalog.loaded_at < CATALOG_MAX_AGE
+    ):
+        return catalog
+    with _catalog_lock:
+        if _catalog is catalog:
+            _catalog = IngredientCatalog(
+                version,
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            )
+        return _catalog
@@ -0,0 +1,240 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+
+from rest_framework.renderers import BaseRenderer
+
+CYRILLIC_TO_LATIN = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'iu', 'я': 'ia',
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'E',
+    'Ж': 'Zh', 'З': 'Z', 'И': 'I', 'Й': 'I', 'К': 'K', 'Л': 'L', 'М': 'M',
+    'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
+    'Ф': 'F', 'Х': 'Kh', 'Ц': 'Ts', 'Ч': 'Ch', 'Ш': 'Sh', 'Щ': 'Shch',
+    'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'Iu', 'Я': 'Ia',
+})
+
+
+def buffer_chunks(chunks, size=64 * 1024):
+    """Join small chunks so the server doesn't write once per row."""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class ShoppingListExporter(BaseRenderer, metaclass=ABCMeta):
+    """Base class for shopping list formats.
+
+    Exporters double as DRF renderers so that `?format=` and the Accept
+    header select them through regular content negotiation. `stream()`
+    yields the document chunk by chunk from an iterable of rows with
+    `name`, `measurement_unit` and `total` keys.
+    """
+
+    extension = None
+    title = 'Shopping List'
+
+    @abstractmethod
+    def stream(self, rows):
+        """Yield the document for rows as str or bytes chunks."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            return b''.join(buffer_chunks(self.stream(data)))
+        return json.dumps(data).encode()
+
+
+class TextExporter(ShoppingListExporter):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, rows):
+        yield f'{self.title}:\n\n'
+        for row in rows:
+            yield (
+                f"- {row['name']} ({row['measurement_unit']}) "
+                f"- {row['total']}\n"
+            )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class CsvExporter(ShoppingListExporter):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'total'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['measurement_unit'], row['total'])
+            )
+
+
+class JsonExporter(ShoppingListExporter):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def stream(self, rows):
+        yield '['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps({
+                'name': row['name'],
+                'measurement_unit': row['measurement_unit'],
+                'total': row['total'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+
+
+class PdfExporter(ShoppingListExporter):
+    """Minimal PDF 1.4 writer using the built-in Helvetica font.
+
+    The standard PDF fonts have no Cyrillic glyphs, so text is
+    transliterated to Latin instead of embedding a font file.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    extension = 'pdf'
+    charset = None
+    render_style = 'binary'
+    lines_per_page = 50
+    page_width = 595
+    page_height = 842
+
+    def stream(self, rows):
+        writer = PdfWriter(self)
+        yield from writer.write(self.iter_lines(rows))
+
+    def iter_lines(self, rows):
+        yield self.title
+        yield ''
+        for row in rows:
+            yield (
+                f"- {row['name']} ({row['measurement_unit']}) "
+                f"- {row['total']}"
+            )
+
+    @staticmethod
+    def escape(text):
+        text = str(text).translate(CYRILLIC_TO_LATIN)
+        text = text.encode('latin-1', 'replace').decode('latin-1')
+        return (
+            text.replace('\\', '\\\\')
+            .replace('(', '\\(')
+            .replace(')', '\\)')
+        )
+
+
+class PdfWriter:
+    """Write PDF objects sequentially, tracking offsets for the xref.
+
+    Object 1 is the catalog, 2 the page tree and 3 the font. The page
+    tree is written last, once all page object numbers are known.
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.offsets = {}
+        self.pages = []
+        self.position = 0
+        self.next_number = 4
+
+    def emit(self, data):
+        self.position += len(data)
+        return data
+
+    def emit_object(self, number, body):
+        self.offsets[number] = self.position
+        return self.emit(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def page_objects(self, lines):
+        exporter = self.exporter
+        content = [
+            'BT', '/F1 11 Tf', '14 TL', f'50 {exporter.page_height - 50} Td'
+        ]
+        content.extend(f'({exporter.escape(line)}) Tj T*' for line in lines)
+        content.append('ET')
+        stream = '\n'.join(content).encode('latin-1')
+        content_number = self.next_number
+        page_number = content_number + 1
+        self.next_number += 2
+        yield self.emit_object(
+            content_number,
+            b'<< /Length %d >>\nstream\n' % len(stream)
+            + stream + b'\nendstream'
+        )
+        yield self.emit_object(
+            page_number,
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> '
+            b'/Contents %d 0 R >>' % (
+                exporter.page_width, exporter.page_height, content_number
+            )
+        )
+        self.pages.append(page_number)
+
+    def write(self, lines):
+        yield self.emit(b'%PDF-1.4\n')
+        yield self.emit_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        yield self.emit_object(
+            3,
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            b'/Encoding /WinAnsiEncoding >>'
+        )
+        page = []
+        for line in lines:
+            page.append(line)
+            if len(page) == self.exporter.lines_per_page:
+                yield from self.page_objects(page)
+                page = []
+        if page or not self.pages:
+            yield from self.page_objects(page)
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        yield self.emit_object(
+            2,
+            b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                kids, len(self.pages)
+            )
+        )
+        xref_position = self.position
+        xref = [b'xref\n0 %d\n' % self.next_number, b'0000000000 65535 f \n']
+        xref.extend(
+            b'%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, self.next_number)
+        )
+        yield self.emit(b''.join(xref))
+        yield self.emit(
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (self.next_number, xref_position)
+        )
+
+
+SHOPPING_LIST_EXPORTERS = (
+    TextExporter,
+    CsvExporter,
+    JsonExporter,
+    PdfExporter,
+)
@@ -0,0 +1,182 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from common.pagination import before_position
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from users.models import Subscription, User
+
+from .models import FeedEntry, Recipe
+
+FANOUT_BATCH_SIZE = 1000
+
+logger = logging.getLogger('foodgram.feed')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_pull_author(author):
+    """Authors above the threshold are merged into feeds at read time."""
+    return author.subscribers_count > settings.FEED_FANOUT_MAX_SUBSCRIBERS
+
+
+def insert_entries(entries):
+    """Insert entries FANOUT_BATCH_SIZE at a time, each batch committed
+    on its own so that no transaction spans a large fan-out."""
+    entries = iter(entries)
+    while batch := list(islice(entries, FANOUT_BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe_id):
+    """Write a new recipe into the timelines of its author's subscribers."""
+    recipe = Recipe.objects.select_related('author').only(
+        'pub_date', 'author__subscribers_count'
+    ).filter(pk=recipe_id).first()
+    if recipe is None or is_pull_author(recipe.author):
+        return
+    subscribers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    insert_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                  pub_date=recipe.pub_date)
+        for user_id in subscribers.iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+
+
+def get_executor():
+    # Created lazily so that no thread exists before gunicorn forks.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.FEED_FANOUT_WORKERS, thread_name_prefix='feed'
+            )
+        return _executor
+
+
+def run_logged(function, *args):
+    try:
+        function(*args)
+    except Exception:
+        logger.exception('Feed update %s%r failed', function.__name__, args)
+
+
+def run_in_worker(function, *args):
+    """run_logged() in a pool thread, wrapped like a request."""
+    close_old_connections()
+    try:
+        run_logged(function, *args)
+    finally:
+        close_old_connections()
+
+
+def schedule(function, *args):
+    """Run a feed update once the transaction commits.
+
+    Fan-out and backfill write up to FEED_FANOUT_MAX_SUBSCRIBERS rows, so
+    they run in the worker pool rather than in the request; with
+    FEED_FANOUT_WORKERS=0 they run synchronously in the committing
+    thread. Timelines missed by a failed update are restored by the
+    rebuild_feeds command.
+    """
+    if settings.FEED_FANOUT_WORKERS > 0:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_in_worker, function, *args)
+        )
+    else:
+        transaction.on_commit(lambda: run_logged(function, *args))
+
+
+def schedule_fan_out(recipe_id):
+    schedule(fan_out_recipe, recipe_id)
+
+
+def add_author_to_feed(user_id, author_id):
+    """Backfill a new subscription unless the author is read-merged."""
+    author = User.objects.only('subscribers_count').get(pk=author_id)
+    if is_pull_author(author):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )
+    insert_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes.iterator(
+            chunk_size=FANOUT_BATCH_SIZE
+        )
+    )
+
+
+def schedule_backfill(user_id, author_id):
+    schedule(add_author_to_feed, user_id, author_id)
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def rebuild_feeds():
+    """Recreate every timeline from the subscriptions table.
+
+    Needed after changing FEED_FANOUT_MAX_SUBSCRIBERS or when an author
+    drops back below it, since recipes published while the author was
+    read-merged were never fanned out. Runs as one INSERT ... SELECT.
+    """
+    FeedEntry.objects.all().delete()
+    connection = connections[FeedEntry.objects.db]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry._meta.db_table)} '
+            '(user_id, recipe_id, pub_date) '
+            'SELECT s.user_id, r.id, r.pub_date '
+            f'FROM {quote(Subscription._meta.db_table)} s '
+            f'JOIN {quote(User._meta.db_table)} a ON a.id = s.author_id '
+            f'JOIN {quote(Recipe._meta.db_table)} r '
+            'ON r.author_id = s.author_id '
+            'WHERE a.subscribers_count <= %s',
+            [settings.FEED_FANOUT_MAX_SUBSCRIBERS]
+        )
+        return cursor.rowcount
+
+
+def get_feed(user, position=None, limit=10):
+    """Return up to limit (pub_date, recipe_id) pairs, newest first.
+
+    Timeline rows cover ordinary authors. Recipes of authors with more
+    than FEED_FANOUT_MAX_SUBSCRIBERS subscribers are never fanned out;
+    the newest `limit` recipes of each such author are read from the
+    (author, pub_date) index and merged in. Recipes present in both
+    sources, e.g. after an author crosses the threshold, appear once.
+    """
+    pushed = before_position(
+        FeedEntry.objects.filter(user=user), position, 'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit]
+    rows = set(pushed)
+
+    pull_authors = Subscription.objects.filter(
+        user=user,
+        author__subscribers_count__gt=settings.FEED_FANOUT_MAX_SUBSCRIBERS
+    ).values_list('author_id', flat=True)
+    branches = [
+        before_position(
+            Recipe.objects.filter(author_id=author_id), position
+        ).order_by('-pub_date', '-pk').values_list('pub_date', 'pk')[:limit]
+        for author_id in pull_authors
+    ]
+    features = connections[FeedEntry.objects.db].features
+    if len(branches) > 1 and features.supports_slicing_ordering_in_compound:
+        rows.update(branches[0].union(*branches[1:], all=True))
+    else:
+        for branch in branches:
+            rows.update(branch)
+    return sorted(rows, reverse=True)[:limit]
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from recipes.models import Recipe
+from recipes.shortlinks import encode_short_id
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Assign short IDs to recipes that do not have one yet'
+
+    def handle(self, *args, **options):
+        missing = Recipe.objects.filter(
+            Q(short_id__isnull=True) | Q(short_id='')
+        ).only('pk')
+        total = 0
+        while True:
+            recipes = list(missing[:BATCH_SIZE])
+            if not recipes:
+                break
+            for recipe in recipes:
+                recipe.short_id = encode_short_id(recipe.pk)
+            Recipe.objects.bulk_update(recipes, ('short_id',))
+            total += len(recipes)
+        self.stdout.write(
+            self.style.SUCCESS(f'Short IDs assigned to {total} recipes')
+        )
@@ -0,0 +1,148 @@
+import random
+import statistics
+import time
+
+from common.benchmark import percentile, power_law_subscriptions
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.feed import fan_out_recipe, get_feed
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+PULL_ONLY = 0
+PUSH_ONLY = 2 ** 31
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the subscription feed under a power-law follower '
+        'distribution. All generated data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Subscriptions per user')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of author popularity')
+        parser.add_argument('--threshold', type=int, default=None,
+                            help='Hybrid fan-out threshold, defaults to '
+                                 'the 99th percentile of subscribers')
+        parser.add_argument('--samples', type=int, default=200,
+                            help='Readers per strategy, two pages each')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        with transaction.atomic():
+            users, recipe_ids = self.generate(options)
+            threshold = self.report_distribution()
+            if options['threshold'] is not None:
+                threshold = options['threshold']
+            strategies = (
+                ('push', PUSH_ONLY),
+                ('pull', PULL_ONLY),
+                (f'hybrid>{threshold}', threshold),
+            )
+            readers = self.random.sample(
+                users, min(options['samples'], len(users))
+            )
+            for name, limit in strategies:
+                with override_settings(FEED_FANOUT_MAX_SUBSCRIBERS=limit):
+                    self.run_strategy(name, recipe_ids, readers)
+            transaction.set_rollback(True)
+
+    def generate(self, options):
+        offset = User.objects.count()
+        users = User.objects.bulk_create(
+            User(
+                username=f'feed_bench_{offset + number}',
+                email=f'feed_bench_{offset + number}@example.com',
+                first_name='Bench',
+                last_name='User'
+            )
+            for number in range(options['users'])
+        )
+        subscriptions = power_law_subscriptions(
+            self.random, users, options['follows'], options['skew']
+        )
+        Subscription.objects.bulk_create(
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id, author_id in subscriptions
+            ),
+            batch_size=1000
+        )
+        User.objects.filter(pk__in=[user.pk for user in users]).update(
+            subscribers_count=Coalesce(
+                Subquery(
+                    Subscription.objects.filter(author=OuterRef('pk'))
+                    .order_by()
+                    .values('author')
+                    .annotate(total=Count('pk'))
+                    .values('total')
+                ),
+                0
+            )
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=self.random.choice(users),
+                    name=f'Feed bench {number}',
+                    text='Benchmark recipe',
+                    cooking_time=10,
+                    image='recipes/images/bench.png'
+                )
+                for number in range(options['recipes'])
+            ),
+            batch_size=1000
+        )
+        return users, [recipe.pk for recipe in recipes]
+
+    def report_distribution(self):
+        counts = list(
+            User.objects.filter(username__startswith='feed_bench_')
+            .values_list('subscribers_count', flat=True)
+        )
+        self.stdout.write(
+            f'subscribers per author: max={max(counts)} '
+            f'p99={percentile(counts, 0.99)} '
+            f'median={statistics.median(counts)}'
+        )
+        return percentile(counts, 0.99)
+
+    def run_strategy(self, name, recipe_ids, readers):
+        FeedEntry.objects.all().delete()
+        writes = []
+        for recipe_id in recipe_ids:
+            started = time.perf_counter()
+            fan_out_recipe(recipe_id)
+            writes.append((time.perf_counter() - started) * 1000)
+        rows = FeedEntry.objects.count()
+        reads = []
+        queries = []
+        for reader in readers:
+            position = None
+            for _ in range(2):
+                reset_queries()
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as context:
+                    page = get_feed(reader, position)
+                reads.append((time.perf_counter() - started) * 1000)
+                queries.append(len(context))
+                if not page:
+                    break
+                position = page[-1]
+        self.stdout.write(
+            f'{name:>14}: rows={rows} '
+            f'write p50={percentile(writes, 0.5):.2f}ms '
+            f'p99={percentile(writes, 0.99):.2f}ms | '
+            f'read p50={percentile(reads, 0.5):.2f}ms '
+            f'p99={percentile(reads, 0.99):.2f}ms '
+            f'queries={statistics.mean(queries):.1f}'
+        )
@@ -0,0 +1,87 @@
+import random
+import threading
+import time
+
+from common.benchmark import percentile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from recipes import pantry
+from recipes.models import IngredientInRecipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark pantry lookups while the index is rebuilt after '
+        'PANTRY_MAX_AGE, on the current dataset (see '
+        'generate_benchmark_data)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8,
+                            help='Threads issuing lookups concurrently')
+        parser.add_argument('--pantry-size', type=int, default=8)
+        parser.add_argument('--max-missing', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(
+            IngredientInRecipe.objects.values_list('ingredient_id', flat=True)
+            .distinct()
+        )
+        if not ingredient_ids:
+            raise CommandError(
+                'No recipe ingredients, run generate_benchmark_data first'
+            )
+        rng = random.Random(options['seed'])
+        size = min(options['pantry_size'], len(ingredient_ids))
+        lookup = (rng.sample(ingredient_ids, size), options['max_missing'])
+
+        started = time.perf_counter()
+        pantry.match_pantry(*lookup)
+        self.report('cold build', [time.perf_counter() - started])
+        timings = []
+        for _ in range(100):
+            started = time.perf_counter()
+            pantry.match_pantry(*lookup)
+            timings.append(time.perf_counter() - started)
+        self.report('warm lookups', timings)
+
+        pantry.expire_index()
+        timings = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    pantry.match_pantry(*lookup)
+                    timings.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        readers = [
+            threading.Thread(target=read)
+            for _ in range(options['readers'])
+        ]
+        started = time.perf_counter()
+        for reader in readers:
+            reader.start()
+        # The first expired lookup starts the rebuild.
+        while not timings:
+            time.sleep(0.001)
+        pantry.wait_for_rebuild()
+        rebuild = time.perf_counter() - started
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.report('lookups during rebuild', timings)
+        self.stdout.write(f'background rebuild took {rebuild * 1000:.2f}ms')
+
+    def report(self, name, timings):
+        timings = [seconds * 1000 for seconds in timings]
+        self.stdout.write(
+            f'{name}: n={len(timings)} '
+            f'p50={percentile(timings, 0.5):.2f}ms '
+            f'p99={percentile(timings, 0.99):.2f}ms '
+            f'max={max(timings):.2f}ms'
+        )
@@ -1,7 +1,8 @@
 import csv
 
 from django.core.management.base import BaseCommand
-from recipes.models import Ingredient 
+from recipes.catalog import bump_catalog_version
+from recipes.models import Ingredient
 #Здесь сортировка импортов выполнена с помощью isort
 
 
@@ -39,6 +40,7 @@ class Command(BaseCommand):
                 ingredients_to_create,
                 batch_size=100
             )
+            bump_catalog_version()
             
             self.stdout.write(
                 self.style.SUCCESS(
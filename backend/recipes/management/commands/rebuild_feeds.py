@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Recreate precomputed subscription feeds'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            entries = rebuild_feeds()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Feeds rebuilt with {entries} entries'
+            )
+        )
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def count_subquery(model, field):
+    """Rows of model pointing at the outer row, 0 when there are none."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate denormalized favorites, cart, recipes '
+        'and subscribers counters'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_subquery(Favorite, 'recipe'),
+                cart_count=count_subquery(ShoppingCart, 'recipe')
+            )
+            users = User.objects.update(
+                recipes_count=count_subquery(Recipe, 'author'),
+                subscribers_count=count_subquery(Subscription, 'author')
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Counters reconciled for {recipes} recipes '
+                f'and {users} users'
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.ranking import refresh_stale_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh materialized popular/trending scores of recipes whose '
+        'favorites or shopping carts changed. Run it periodically, '
+        'e.g. from cron every few minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every score, e.g. after changing the half-life'
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_stale_scores(full=options['full'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Scores refreshed for {refreshed} recipes')
+        )
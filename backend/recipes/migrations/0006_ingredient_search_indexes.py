@@ -0,0 +1,49 @@
+from django.db import DatabaseError, migrations, transaction
+
+PREFIX_INDEX = 'recipes_ingredient_name_lower_prefix_idx'
+TRIGRAM_INDEX = 'recipes_ingredient_name_lower_trgm_idx'
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create PostgreSQL-only indexes for ingredient autocomplete.
+
+    The trigram index is only created when the pg_trgm extension is
+    installed or can be installed by the migrating role.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PREFIX_INDEX} '
+            'ON recipes_ingredient (LOWER(name) text_pattern_ops)'
+        )
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+            'ON recipes_ingredient USING gin (LOWER(name) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+        cursor.execute(f'DROP INDEX IF EXISTS {PREFIX_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_scores(apps, schema_editor):
+    """Seed popularity from the counters; trending is filled on refresh."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=pk, popular=favorites + carts)
+            for pk, favorites, carts in Recipe.objects.values_list(
+                'pk', 'favorites_count', 'cart_count'
+            ).iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feed_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='added at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='added at'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='recipe')),
+                ('popular', models.PositiveIntegerField(default=0, verbose_name='popularity')),
+                ('trending', models.FloatField(default=0, verbose_name='trending score')),
+                ('stale', models.BooleanField(default=True, verbose_name='needs refresh')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='refreshed at')),
+            ],
+            options={
+                'verbose_name': 'recipe score',
+                'verbose_name_plural': 'recipe scores',
+                'indexes': [models.Index(fields=['-popular', '-recipe'], name='recipe_score_popular_idx'), models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending_idx'), models.Index(condition=models.Q(('stale', True)), fields=['recipe'], name='recipe_score_stale_idx')],
+            },
+        ),
+        migrations.RunPython(create_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:50
+
+from django.db import migrations, models
+
+
+def clear_empty_short_ids(apps, schema_editor):
+    """Turn '' into NULL; run backfill_short_ids afterwards."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(short_id='').update(short_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_id',
+            field=models.CharField(blank=True, editable=False, help_text='Short identifier for sharing links', max_length=10, null=True, unique=True, verbose_name='short ID'),
+        ),
+        migrations.RunPython(clear_empty_short_ids, migrations.RunPython.noop),
+    ]
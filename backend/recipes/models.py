@@ -1,7 +1,11 @@
+from common.models import CounterFieldsMixin
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Value
 from django.urls import reverse
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -24,7 +28,29 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_user_annotations(self, user):
+        """Annotate is_favorited/is_in_shopping_cart for the given viewer."""
+        if user is None or user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        )
+
+    def touch(self):
+        """Bump updated_at when rows rendered with the recipes change."""
+        return self.update(updated_at=timezone.now())
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         verbose_name='recipe author',
@@ -39,6 +65,12 @@ class Recipe(models.Model):
         verbose_name='recipe image',
         upload_to='recipes/images/'
     )
+    image_renditions = models.JSONField(
+        verbose_name='image renditions',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='recipe description'
     )
@@ -58,26 +90,61 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='updated at',
+        auto_now=True,
+        db_index=True
+    )
     short_id = models.CharField(
         verbose_name='short ID',
         help_text='Short identifier for sharing links',
         max_length=10,
         unique=True,
-        default='',
+        null=True,
         blank=True,
-        db_index=True
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='in favorites',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        verbose_name='in shopping carts',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='search vector',
+        null=True,
+        editable=False
     )
 
+    objects = RecipeQuerySet.as_manager()
+
+    # Left out of full saves, see CounterFieldsMixin.
+    counter_fields = ('favorites_count', 'cart_count')
+
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'recipe'
         verbose_name_plural = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
-        return reverse('recipe-detail', kwargs={'pk': self.pk})
+        return reverse('api:recipe-detail', kwargs={'pk': self.pk})
 
 
 class IngredientInRecipe(models.Model):
@@ -124,6 +191,12 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorited_by'
     )
+    added_at = models.DateTimeField(
+        verbose_name='added at',
+        auto_now_add=True
+    )
+
+    counter_field = 'favorites_count'
 
     class Meta:
         verbose_name = 'favorite recipe'
@@ -152,6 +225,12 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='in_shopping_carts'
     )
+    added_at = models.DateTimeField(
+        verbose_name='added at',
+        auto_now_add=True
+    )
+
+    counter_field = 'cart_count'
 
     class Meta:
         verbose_name = 'shopping cart item'
@@ -164,4 +243,105 @@ class ShoppingCart(models.Model):
         ]
 
     def __str__(self):
-        return f'{self.recipe} in {self.user}\'s shopping cart' 
\ No newline at end of file
+        return f'{self.recipe} in {self.user}\'s shopping cart' 
+
+
+class RecipeScore(models.Model):
+    """Materialized ranking of a recipe for ?ordering=popular/trending.
+
+    popular is favorites plus shopping carts. trending is
+    log2(sum(2 ** (added_at / half-life))) over the same rows: it orders
+    recipes exactly like their exponentially decayed counts, but unlike
+    the decayed counts it does not change while nothing happens, so only
+    rows marked stale have to be refreshed.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='recipe',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    popular = models.PositiveIntegerField(
+        verbose_name='popularity',
+        default=0
+    )
+    trending = models.FloatField(
+        verbose_name='trending score',
+        default=0
+    )
+    stale = models.BooleanField(
+        verbose_name='needs refresh',
+        default=True
+    )
+    refreshed_at = models.DateTimeField(
+        verbose_name='refreshed at',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'recipe score'
+        verbose_name_plural = 'recipe scores'
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'],
+                name='recipe_score_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'],
+                name='recipe_score_trending_idx'
+            ),
+            models.Index(
+                fields=['recipe'],
+                condition=models.Q(stale=True),
+                name='recipe_score_stale_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'Score of {self.recipe_id}'
+
+
+class FeedEntry(models.Model):
+    """Precomputed row of a subscriber's feed (fan-out on write).
+
+    pub_date is copied from the recipe so that a timeline page is a single
+    index range scan on (user, pub_date, recipe).
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='subscriber',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='recipe',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='publication date'
+    )
+
+    class Meta:
+        verbose_name = 'feed entry'
+        verbose_name_plural = 'feed entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} in {self.user}\'s feed'
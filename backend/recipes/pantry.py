@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .models import IngredientInRecipe
+
+EPOCH_KEY = 'pantry:epoch'
+JOURNAL_TIMEOUT = 60 * 60
+MAX_JOURNAL_REPLAY = 1000
+PANTRY_MAX_AGE = 300
+
+logger = logging.getLogger('foodgram.pantry')
+
+
+class PantryIndex:
+    """In-memory inverted index from ingredient to recipe IDs.
+
+    Matching counts, per recipe, how many of the pantry ingredients it
+    uses by feeding the posting sets to Counter.update(), which runs in
+    C. Recipes are then kept when their remaining ingredients are few
+    enough.
+    """
+
+    def __init__(self, epoch, seq):
+        self.epoch = epoch
+        self.seq = seq
+        self.loaded_at = time.monotonic()
+        self.postings = defaultdict(set)
+        self.recipe_ingredients = {}
+
+    def load(self, rows):
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in rows:
+            recipes[recipe_id].add(ingredient_id)
+            self.postings[ingredient_id].add(recipe_id)
+        self.recipe_ingredients = {
+            recipe_id: frozenset(ingredient_ids)
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+
+    def apply(self, recipe_id, ingredient_ids):
+        """Replace the indexed ingredients of a single recipe."""
+        for ingredient_id in self.recipe_ingredients.pop(recipe_id, ()):
+            self.postings[ingredient_id].discard(recipe_id)
+        if ingredient_ids:
+            self.recipe_ingredients[recipe_id] = frozenset(ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                self.postings[ingredient_id].add(recipe_id)
+
+    def match(self, pantry, max_missing):
+        """Return (recipe_id, missing, matched) tuples, best first."""
+        covered = Counter()
+        for ingredient_id in set(pantry):
+            covered.update(self.postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, matched in covered.items():
+            missing = len(self.recipe_ingredients[recipe_id]) - matched
+            if missing <= max_missing:
+                results.append((missing, -matched, -recipe_id))
+        results.sort()
+        return [
+            (-recipe_id, missing, -matched)
+            for missing, matched, recipe_id in results
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuild = None
+
+
+def get_epoch():
+    epoch = cache.get(EPOCH_KEY)
+    if epoch is None:
+        cache.add(EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        epoch = cache.get(EPOCH_KEY)
+    return epoch
+
+
+def seq_key(epoch):
+    return f'pantry:{epoch}:seq'
+
+
+def change_key(epoch, seq):
+    return f'pantry:{epoch}:change:{seq}'
+
+
+def record_recipe_changes(recipe_ids):
+    """Append recipe IDs to the shared change journal.
+
+    Every process replays the journal into its own index on the next
+    lookup. If the sequence key was lost, the epoch is rotated instead,
+    which makes every process rebuild from the database.
+    """
+    epoch = get_epoch()
+    key = seq_key(epoch)
+    cache.add(key, 0, timeout=None)
+    try:
+        seq = cache.incr(key)
+    except ValueError:
+        cache.delete(EPOCH_KEY)
+        return
+    cache.set(
+        change_key(epoch, seq), list(recipe_ids), timeout=JOURNAL_TIMEOUT
+    )
+
+
+def schedule_pantry_update(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: record_recipe_changes(recipe_ids))
+
+
+def build_index(epoch, seq):
+    index = PantryIndex(epoch, seq)
+    index.load(
+        IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000)
+    )
+    return index
+
+
+def replay_journal(index, epoch, seq):
+    """Bring the index up to seq; return False when a rebuild is needed."""
+    if seq - index.seq > MAX_JOURNAL_REPLAY:
+        return False
+    keys = [
+        change_key(epoch, number)
+        for number in range(index.seq + 1, seq + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    recipe_ids = {
+        recipe_id for recipe_ids in changes.values()
+        for recipe_id in recipe_ids
+    }
+    ingredients = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].add(ingredient_id)
+    for recipe_id in recipe_ids:
+        index.apply(recipe_id, ingredients.get(recipe_id))
+    index.seq = seq
+    return True
+
+
+def rebuild_index(epoch, seq):
+    """Build a fresh index and swap it in unless the epoch moved on."""
+    global _index, _rebuild
+    try:
+        index = build_index(epoch, seq)
+        with _index_lock:
+            if _index is None or _index.epoch == epoch:
+                # Changes after seq are replayed by the next lookup.
+                _index = index
+    except Exception:
+        logger.exception('Rebuilding the pantry index failed')
+    finally:
+        connections.close_all()
+        with _index_lock:
+            _rebuild = None
+
+
+def start_rebuild(epoch, seq):
+    """Rebuild in a background thread; must hold _index_lock."""
+    global _rebuild
+    if _rebuild is None:
+        _rebuild = threading.Thread(
+            target=rebuild_index, args=(epoch, seq),
+            name='pantry-index', daemon=True
+        )
+        _rebuild.start()
+
+
+def wait_for_rebuild():
+    """Block until a background rebuild, if any, has finished."""
+    rebuild = _rebuild
+    if rebuild is not None:
+        rebuild.join()
+
+
+def expire_index():
+    """Make the next lookup refresh the index, as after PANTRY_MAX_AGE."""
+    with _index_lock:
+        if _index is not None:
+            _index.loaded_at -= PANTRY_MAX_AGE
+
+
+def match_pantry(pantry, max_missing):
+    """Refresh the process-local index if needed and match the pantry.
+
+    The journal lives in the shared cache. PANTRY_MAX_AGE bounds
+    staleness when the cache is process-local and other workers'
+    changes never reach this one's journal: an index that old is
+    rebuilt in a background thread while lookups keep using it. Only a
+    missing index, a new epoch or a journal gap rebuild synchronously,
+    since the old index is then known to be wrong.
+    """
+    global _index
+    epoch = get_epoch()
+    key = seq_key(epoch)
+    cache.add(key, 0, timeout=None)
+    seq = cache.get(key, 0)
+    with _index_lock:
+        index = _index
+        if (
+            index is None
+            or index.epoch != epoch
+            or index.seq > seq
+            or (index.seq < seq and not replay_journal(index, epoch, seq))
+        ):
+            index = _index = build_index(epoch, seq)
+        elif time.monotonic() - index.loaded_at >= PANTRY_MAX_AGE:
+            start_rebuild(epoch, seq)
+        return index.match(pantry, max_missing)
@@ -0,0 +1,93 @@
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_recipe_list_version
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+RANKINGS = ('popular', 'trending')
+REFRESH_BATCH_SIZE = 1000
+
+
+def trending_score(timestamps, half_life):
+    """log2 of sum(2 ** (t / half_life)), computed without overflow."""
+    if not timestamps:
+        return 0.0
+    exponents = [timestamp / half_life for timestamp in timestamps]
+    top = max(exponents)
+    return top + math.log2(
+        sum(2 ** (exponent - top) for exponent in exponents)
+    )
+
+
+def mark_scores_stale(recipe_ids):
+    RecipeScore.objects.filter(recipe_id__in=list(recipe_ids)).update(
+        stale=True
+    )
+
+
+def create_missing_scores():
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                score__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=REFRESH_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def refresh_scores(recipe_ids):
+    """Recompute the scores of the given recipes.
+
+    Rows are marked fresh before the source rows are read, so a favorite
+    added meanwhile marks its recipe stale again for the next run.
+    """
+    RecipeScore.objects.filter(recipe_id__in=recipe_ids).update(stale=False)
+    half_life = settings.RECIPE_TRENDING_HALF_LIFE_HOURS * 3600
+    timestamps = defaultdict(list)
+    for model in (Favorite, ShoppingCart):
+        for recipe_id, added_at in model.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'added_at'):
+            timestamps[recipe_id].append(added_at.timestamp())
+    now = timezone.now()
+    RecipeScore.objects.bulk_update(
+        [
+            RecipeScore(
+                recipe_id=recipe_id,
+                popular=favorites_count + cart_count,
+                trending=trending_score(timestamps[recipe_id], half_life),
+                refreshed_at=now
+            )
+            for recipe_id, favorites_count, cart_count in
+            Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                'pk', 'favorites_count', 'cart_count'
+            )
+        ],
+        ('popular', 'trending', 'refreshed_at')
+    )
+    bump_recipe_list_version()
+
+
+def refresh_stale_scores(full=False):
+    """Refresh every stale score in batches; return the number refreshed."""
+    create_missing_scores()
+    if full:
+        RecipeScore.objects.update(stale=True)
+    refreshed = 0
+    while True:
+        recipe_ids = list(
+            RecipeScore.objects.filter(stale=True)
+            .values_list('recipe_id', flat=True)[:REFRESH_BATCH_SIZE]
+        )
+        if not recipe_ids:
+            return refreshed
+        with transaction.atomic():
+            refresh_scores(recipe_ids)
+        refreshed += len(recipe_ids)
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, transaction
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Subquery, TextField, Value, When)
+from django.db.models.functions import Coalesce
+
+from .models import IngredientInRecipe, Recipe
+
+
+def is_postgresql(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def recipe_search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(names=StringAgg('ingredient__name', ' '))
+        .values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('', output_field=TextField())),
+            weight='B',
+            config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    """Recompute the stored tsvector of the given recipes (PostgreSQL)."""
+    if not is_postgresql():
+        return
+    Recipe.objects.filter(pk__in=list(recipe_ids)).update(
+        search_vector=recipe_search_vector()
+    )
+
+
+def schedule_search_update(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids and is_postgresql():
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+def search_recipes(queryset, query):
+    """Filter and rank recipes by name, ingredient names and text.
+
+    PostgreSQL matches the stored tsvector with websearch syntax. Other
+    backends require every word to appear in the name, an ingredient name
+    or the description, and rank name > ingredient > description hits.
+    """
+    if is_postgresql(queryset.db):
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    terms = query.split()
+    if not terms:
+        return queryset
+    rank = Value(0)
+    for term in terms:
+        in_ingredients = Exists(
+            IngredientInRecipe.objects.filter(
+                recipe=OuterRef('pk'),
+                ingredient__name__icontains=term
+            )
+        )
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(text__icontains=term)
+            | in_ingredients
+        )
+        rank = rank + Case(
+            When(name__icontains=term, then=Value(4)), default=Value(0),
+            output_field=IntegerField()
+        ) + Case(
+            When(in_ingredients, then=Value(2)), default=Value(0),
+            output_field=IntegerField()
+        ) + Case(
+            When(text__icontains=term, then=Value(1)), default=Value(0),
+            output_field=IntegerField()
+        )
+    return queryset.annotate(search_rank=rank).order_by(
+        '-search_rank', '-pub_date', '-id'
+    )
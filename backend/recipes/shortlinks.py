@@ -0,0 +1,96 @@
+import hashlib
+import string
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe
+
+ALPHABET = string.digits + string.ascii_letters
+SHORT_ID_BITS = 40
+SHORT_ID_LENGTH = 7
+FEISTEL_ROUNDS = 4
+SHORT_LINK_TIMEOUT = 60 * 60 * 24
+SHORT_LINK_MISS_TIMEOUT = 60
+
+HALF_BITS = SHORT_ID_BITS // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+
+
+def feistel_round(value, round_number):
+    digest = hashlib.blake2b(
+        value.to_bytes(4, 'big') + bytes([round_number]),
+        key=settings.SHORT_LINK_KEY.encode(),
+        digest_size=4
+    ).digest()
+    return int.from_bytes(digest, 'big') & HALF_MASK
+
+
+def permute(number):
+    """Keyed Feistel permutation of [0, 2 ** SHORT_ID_BITS).
+
+    Being a bijection, distinct primary keys can never share a short ID,
+    while consecutive keys still map to unrelated-looking strings.
+    """
+    left, right = number >> HALF_BITS, number & HALF_MASK
+    for round_number in range(FEISTEL_ROUNDS):
+        left, right = right, left ^ feistel_round(right, round_number)
+    return (left << HALF_BITS) | right
+
+
+def to_base62(number):
+    chars = []
+    while number:
+        number, digit = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars)).rjust(SHORT_ID_LENGTH, ALPHABET[0])
+
+
+def encode_short_id(pk):
+    if not 0 < pk < 1 << SHORT_ID_BITS:
+        raise ValueError(f'Cannot encode primary key {pk}')
+    return to_base62(permute(pk))
+
+
+def assign_short_id(recipe):
+    """Store the short ID of a freshly inserted recipe."""
+    recipe.short_id = encode_short_id(recipe.pk)
+    Recipe.objects.filter(pk=recipe.pk).update(short_id=recipe.short_id)
+    return recipe.short_id
+
+
+def short_link_key(short_id):
+    return f'shortlink:{short_id}'
+
+
+def resolve_short_id(short_id):
+    """Return the recipe PK for a short ID, or None; cached both ways."""
+    key = short_link_key(short_id)
+    pk = cache.get(key)
+    if pk is None:
+        pk = Recipe.objects.filter(short_id=short_id).values_list(
+            'pk', flat=True
+        ).first() or 0
+        cache.set(
+            key, pk, SHORT_LINK_TIMEOUT if pk else SHORT_LINK_MISS_TIMEOUT
+        )
+    return pk or None
+
+
+async def aresolve_short_id(short_id):
+    """Async counterpart of resolve_short_id."""
+    key = short_link_key(short_id)
+    pk = await cache.aget(key)
+    if pk is None:
+        pk = await Recipe.objects.filter(short_id=short_id).values_list(
+            'pk', flat=True
+        ).afirst() or 0
+        await cache.aset(
+            key, pk, SHORT_LINK_TIMEOUT if pk else SHORT_LINK_MISS_TIMEOUT
+        )
+    return pk or None
+
+
+def forget_short_id(short_id):
+    if short_id:
+        cache.delete(short_link_key(short_id))
@@ -1,13 +1,146 @@
-import hashlib
-
-from django.db.models.signals import pre_save
+from common.images import schedule_renditions
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from users.models import Subscription
+
+from .cache import (bump_cart_versions, bump_collection_versions,
+                    bump_recipe_carts, bump_recipe_list_version)
+from .catalog import bump_catalog_version
+from .feed import (remove_author_from_feed, schedule_backfill,
+                   schedule_fan_out)
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     RecipeScore, ShoppingCart)
+from .pantry import schedule_pantry_update
+from .ranking import mark_scores_stale
+from .search import schedule_search_update
+from .shortlinks import assign_short_id, forget_short_id
+
+User = get_user_model()
+
+# Fields saved by common.images once renditions are rendered.
+RENDITION_FIELDS = frozenset(('image_renditions', 'updated_at'))
+
+# User fields rendered inside every recipe of the author.
+AUTHOR_PROFILE_FIELDS = frozenset((
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_renditions'
+))
+
+
+def increment_counter(model, pk, field):
+    model.objects.filter(pk=pk).update(**{field: F(field) + 1})
+
+
+def decrement_counter(model, pk, field):
+    model.objects.filter(pk=pk, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_written(sender, instance, **kwargs):
+    bump_recipe_list_version()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and update_fields <= RENDITION_FIELDS:
+        # Renditions rendered by common.images, nothing else changed.
+        # Full saves list every field, see CounterFieldsMixin.
+        return
+    if created:
+        assign_short_id(instance)
+        increment_counter(User, instance.author_id, 'recipes_count')
+        schedule_fan_out(instance.pk)
+        RecipeScore.objects.create(recipe=instance)
+    schedule_renditions(instance, 'image')
+    schedule_pantry_update([instance.pk])
+    schedule_search_update([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    decrement_counter(User, instance.author_id, 'recipes_count')
+    schedule_pantry_update([instance.pk])
+    forget_short_id(instance.short_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def collection_item_created(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(Recipe, instance.recipe_id, sender.counter_field)
+        mark_scores_stale([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def collection_item_deleted(sender, instance, **kwargs):
+    decrement_counter(Recipe, instance.recipe_id, sender.counter_field)
+    mark_scores_stale([instance.recipe_id])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(User, instance.author_id, 'subscribers_count')
+        schedule_backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    decrement_counter(User, instance.author_id, 'subscribers_count')
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    bump_cart_versions([instance.user_id])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    bump_collection_versions('favorites', [instance.user_id])
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscriptions_changed(sender, instance, **kwargs):
+    bump_collection_versions('subscriptions', [instance.user_id])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+
 
-from .models import Recipe
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(
+            IngredientInRecipe.objects.filter(ingredient=instance)
+            .values_list('recipe_id', flat=True)
+        )
+        Recipe.objects.filter(pk__in=recipe_ids).touch()
+        bump_recipe_list_version()
+        schedule_search_update(recipe_ids)
+        # Shopping lists are grouped by ingredient name and unit.
+        transaction.on_commit(lambda: bump_recipe_carts(recipe_ids))
 
 
-@receiver(pre_save, sender=Recipe)
-def generate_short_id(sender, instance, **kwargs):
-    if not instance.short_id and instance.id:
-        hash_object = hashlib.sha1(str(instance.id).encode())
-        instance.short_id = hash_object.hexdigest()[:8] 
\ No newline at end of file
+@receiver(post_save, sender=User)
+def author_profile_saved(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None
+        and AUTHOR_PROFILE_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    Recipe.objects.filter(author=instance).touch()
+    bump_recipe_list_version()
@@ -0,0 +1,45 @@
+from django.db.models import Case, F, Value, When
+
+# measurement_unit -> (canonical unit, factor). Only integer factors are
+# listed so that aggregated totals stay integral.
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'ч.л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'ст.л.': ('мл', 15),
+    'стакан': ('мл', 200),
+    'g': ('g', 1),
+    'kg': ('g', 1000),
+    'ml': ('ml', 1),
+    'l': ('ml', 1000),
+    'tsp': ('ml', 5),
+    'tbsp': ('ml', 15),
+}
+
+
+def canonical_unit(unit_field):
+    """SQL expression mapping a measurement unit to its canonical unit."""
+    return Case(
+        *[
+            When(**{unit_field: unit}, then=Value(canonical))
+            for unit, (canonical, factor) in UNIT_CONVERSIONS.items()
+            if unit != canonical
+        ],
+        default=F(unit_field)
+    )
+
+
+def unit_factor(unit_field):
+    """SQL expression giving the multiplier to the canonical unit."""
+    return Case(
+        *[
+            When(**{unit_field: unit}, then=Value(factor))
+            for unit, (canonical, factor) in UNIT_CONVERSIONS.items()
+            if factor != 1
+        ],
+        default=Value(1)
+    )
@@ -12,7 +12,9 @@ class CustomUserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
-        'avatar'
+        'avatar',
+        'recipes_count',
+        'subscribers_count'
     )
     search_fields = ('username', 'email', 'first_name', 'last_name')
 
@@ -1,9 +1,10 @@
+from common.models import CounterFieldsMixin
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 from django.db import models
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         verbose_name='Email address',
         max_length=254,
@@ -34,10 +35,29 @@ class User(AbstractUser):
         default='',
         blank=True
     )
+    avatar_renditions = models.JSONField(
+        verbose_name='Profile picture renditions',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Recipes count',
+        default=0,
+        editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Subscribers count',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    # Left out of full saves, see CounterFieldsMixin.
+    counter_fields = ('recipes_count', 'subscribers_count')
+
     class Meta:
         ordering = ['id']
         verbose_name = 'user'